@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: fx_* effect chains and the post-processing path
+
+Runs every fx_* chain from render_wav.py, plus add_noise and the fused
+post_process stage, on synthetic signals of fixed length (1s SFX, 30s loop,
+3min music) and channel count (mono, stereo). Reports throughput in
+samples/second (frames × channels) and compares against a stored baseline:
+any case slower than baseline by more than --threshold fails the run, and
+so does a missing baseline or a case the baseline has no number for.
+
+Usage:
+  python bench_fx.py                   # compare against bench_baseline.json
+  python bench_fx.py --save-baseline   # record this machine's numbers
+  python bench_fx.py --quick           # skip the 3min cases
+  python bench_fx.py --only boss       # cases whose name contains "boss"
+
+Baselines are machine-specific: record them on the build box that runs
+the comparison.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+import render_wav
+from render_wav import SAMPLE_RATE, add_noise, post_process
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(BASE, "bench_baseline.json")
+
+LENGTHS = [("1s", 1.0), ("30s", 30.0), ("3min", 180.0)]
+CHANNELS = [1, 2]
+NOISE = 0.0015
+
+
+def chains():
+    """Every fx_* factory defined in render_wav, in definition order."""
+    return [(name, fn) for name, fn in vars(render_wav).items()
+            if name.startswith("fx_") and callable(fn)]
+
+
+def make_signal(seconds: float, channels: int) -> np.ndarray:
+    """Decaying tones over a noise bed: exercises filters, drive and reverb."""
+    rng = np.random.default_rng(1234)
+    n = int(seconds * SAMPLE_RATE)
+    t = np.arange(n, dtype=np.float32) / SAMPLE_RATE
+    tone = 0.4 * np.sin(2 * np.pi * 110 * t) * np.exp(-(t % 0.5) * 6)
+    audio = tone[:, None] + 0.05 * rng.standard_normal((n, channels), dtype=np.float32)
+    return audio.astype(np.float32)
+
+
+def cases():
+    """(name, fn(audio) -> None, setup) for every chain and post-processing stage.
+
+    setup(audio), when given, prepares each run's input outside the timed
+    region (post_process works in place, so it gets a fresh copy).
+    """
+    out = []
+    for name, factory in chains():
+        def run(audio, factory=factory):
+            factory()(audio, SAMPLE_RATE)
+        out.append((name, run, None))
+    out.append(("add_noise", lambda audio: add_noise(audio, NOISE), None))
+    out.append(("post_process", lambda audio: post_process(audio, NOISE), np.copy))
+    return out
+
+
+def throughput(fn, audio: np.ndarray, runs: int, setup=None) -> float:
+    """Best-of-runs samples/second for fn on audio."""
+    best = float("inf")
+    for _ in range(runs):
+        arg = setup(audio) if setup else audio
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return audio.size / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fx_* chains and post-FX path.")
+    parser.add_argument("--runs", type=int, default=3, help="timed runs per case (default: 3)")
+    parser.add_argument("--quick", action="store_true", help="skip the 3min cases")
+    parser.add_argument("--only", default="", help="only cases whose name contains this")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="allowed slowdown vs baseline, as a fraction (default: 0.15)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help=f"write results to {os.path.basename(BASELINE)} instead of comparing")
+    args = parser.parse_args()
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(BASELINE):
+        with open(BASELINE) as f:
+            baseline = json.load(f)
+
+    print("=== DungeonSlopper FX Benchmark ===\n")
+    if not args.save_baseline and not baseline:
+        print(f"(no baseline at {BASELINE}; run with --save-baseline to record one)\n")
+
+    lengths = [l for l in LENGTHS if not (args.quick and l[0] == "3min")]
+    results = {}
+    regressions = []
+    unmatched = []
+    print(f"{'case':<36} {'Msamples/s':>11} {'baseline':>9} {'change':>8}")
+    for label, seconds in lengths:
+        for channels in CHANNELS:
+            audio = make_signal(seconds, channels)
+            for name, fn, setup in cases():
+                if args.only not in name:
+                    continue
+                key = f"{name}|{label}|{channels}ch"
+                results[key] = rate = throughput(fn, audio, args.runs, setup)
+
+                line = f"{key:<36} {rate / 1e6:>11.2f}"
+                if key in baseline:
+                    change = rate / baseline[key] - 1
+                    line += f" {baseline[key] / 1e6:>9.2f} {change:>+7.1%}"
+                    if change < -args.threshold:
+                        regressions.append((key, change))
+                        line += "  REGRESSION"
+                elif not args.save_baseline:
+                    unmatched.append(key)
+                    line += f" {'-':>9} {'-':>8}  NO BASELINE"
+                print(line)
+
+    if args.save_baseline:
+        merged = {}
+        if os.path.exists(BASELINE):
+            with open(BASELINE) as f:
+                merged = json.load(f)
+        merged.update(results)
+        with open(BASELINE, "w") as f:
+            json.dump(merged, f, indent=2, sort_keys=True)
+        print(f"\n=== Baseline saved: {len(results)} cases → {BASELINE} ===")
+        return
+
+    if regressions:
+        print(f"\n=== FAILED: {len(regressions)} case(s) slower than baseline "
+              f"by more than {args.threshold:.0%} ===")
+        for key, change in regressions:
+            print(f"  {key}: {change:+.1%}")
+        sys.exit(1)
+
+    if unmatched:
+        print(f"\n=== FAILED: {len(unmatched)} of {len(results)} case(s) have no baseline "
+              f"to compare against; record one with --save-baseline ===")
+        sys.exit(1)
+
+    print(f"\n=== OK: {len(results)} cases within {args.threshold:.0%} of baseline ===")
+
+
+if __name__ == "__main__":
+    main()
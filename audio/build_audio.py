@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+DungeonSlopper one-command rebuild: generators → final audio, in memory
+
+Runs the MIDI generators from generate_midi.py and hands the SMF bytes each
+one would have saved straight to the in-process FluidSynth synth, then
+applies the category effect chain and writes only the final outputs. No
+intermediate clean WAV is written. The .mid files and the generator cache
+are still updated, so a later generate_midi.py / render_wav.py run sees the
+same MIDI and keeps the render cache entries written here.
+
+Assets whose MIDI bytes, soundfont, effect chain and encode settings are
+unchanged are skipped, using the same render cache as render_wav.py.
+
+Usage:
+  python build_audio.py                        # everything, one worker per core
+  python build_audio.py --only music -j 2
+  python build_audio.py --match footstep --formats wav,ogg --manifest
+"""
+
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import generate_midi
+import render_wav
+from render_wav import MIDI_DIR, WAV_DIR, SOUNDFONT, OUTPUT_FORMATS
+
+
+def generate(names):
+    """Run generators in memory. Returns ([(midi_path, category)], {midi_path: bytes}).
+
+    Each file is also saved to midi_path, where generate_midi.py would have
+    put it, and the generator cache is updated to match; rendering still
+    uses the bytes in memory.
+    """
+    jobs = []
+    data = {}
+    cache = generate_midi.load_cache()
+    for name in names:
+        for out, (category, midi) in generate_midi.generate_in_memory(name).items():
+            midi_path = os.path.join(MIDI_DIR, category, f"{out}.mid")
+            os.makedirs(os.path.dirname(midi_path), exist_ok=True)
+            with open(midi_path, "wb") as f:
+                f.write(midi)
+            jobs.append((midi_path, category))
+            data[midi_path] = midi
+        cache[name] = generate_midi.source_hash(name)
+    generate_midi.save_cache(cache)
+    return jobs, data
+
+
+def build(jobs, data, workers: int, options: dict, soundfont: str):
+    """Synthesize + process jobs on warm workers. Returns {midi_path: result}."""
+    print(f"\n--- BUILDING {len(jobs)} files on {workers} workers ---")
+    with ProcessPoolExecutor(max_workers=workers, initializer=render_wav.init_worker,
+                             initargs=("inproc", False, soundfont)) as pool:
+        return render_wav.run_on_pool(pool, jobs, options, data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate, synthesize and process all game audio in memory.")
+    parser.add_argument("--only", default="", help="comma-separated categories to build")
+    parser.add_argument("--match", default="", help="only generators whose name or output contains this")
+    parser.add_argument(
+        "--formats", default="wav",
+        help=f"comma-separated output formats from {', '.join(OUTPUT_FORMATS)} (default: wav)",
+    )
+    parser.add_argument("--full-rate", action="store_true", help="skip the lowpass-derived output rates")
+    parser.add_argument("--targets", default="", help="comma-separated render targets (or all)")
+    parser.add_argument("--trim-onsets", action="store_true", help="cut SFX/UI lead-in silence")
+    parser.add_argument("--sprites", action="store_true", help="pack sprite files (needs wav)")
+    parser.add_argument("--segments", action="store_true", help="split music into bar-aligned chunks (needs wav)")
+    parser.add_argument("--manifest", action="store_true", help="publish hashed outputs + manifest.json")
+    parser.add_argument("--report", action="store_true", help="record per-stage stats to audio/reports")
+    parser.add_argument("-f", "--force", action="store_true", help="ignore the render cache")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=0,
+        help="number of worker processes (0 = one per CPU core, default: 0)",
+    )
+    args = parser.parse_args()
+    print("=== DungeonSlopper Audio Build (in memory) ===\n")
+
+    if not os.path.exists(SOUNDFONT):
+        print(f"ERROR: Soundfont not found at {SOUNDFONT}")
+        return
+    if render_wav.fluidsynth is None:
+        print("ERROR: the in-memory build needs pyfluidsynth and libfluidsynth")
+        print("Install them (pip install pyfluidsynth), or run generate_midi.py + render_wav.py.")
+        return
+
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in OUTPUT_FORMATS]
+    if unknown or not formats:
+        print(f"ERROR: Unknown output format(s): {', '.join(unknown) or '(none)'}")
+        return
+    if (args.sprites or args.segments) and "wav" not in formats:
+        print("ERROR: --sprites/--segments cut the WAV masters; include wav in --formats")
+        return
+    args.targets = render_wav.parse_targets(args.targets)
+    if args.targets is None:
+        return
+
+    all_jobs, data = generate(generate_midi.select(args.only, args.match))
+
+    options = {"backend": "inproc", "stream": False, "formats": formats,
+               "report": args.report, "profile": False, "full_rate": args.full_rate,
+               "trim_onsets": args.trim_onsets, "targets": args.targets}
+    cache = render_wav.load_cache()  # Kept whole: the selection may be a subset
+    soundfont_hash = render_wav.hash_file(SOUNDFONT)
+    jobs, keys = render_wav.plan_jobs(
+        all_jobs, {} if args.force else cache, soundfont_hash, options,
+        key_fn=lambda path, *rest: render_wav.render_key(path, *rest, data=data[path]),
+    )
+    cached = len(all_jobs) - len(jobs)
+    if cached:
+        print(f"Cache: {cached} up-to-date, {len(jobs)} to build")
+
+    workers = min(args.jobs if args.jobs > 0 else (os.cpu_count() or 1), max(1, len(jobs)))
+    # Only rendering is limited to the selection; the index and the
+    # whole-tree stages (sprites, segments, manifest, target reports) see
+    # every asset, or a subset build would drop the rest from them.
+    everything = render_wav.collect_jobs()
+    everything += [job for job in all_jobs if job not in everything]
+    index = render_wav.midi_index(everything, data)
+    soundfont = render_wav.pick_soundfont(all_jobs, index, soundfont_hash)
+    jobs = render_wav.longest_first(jobs, index)
+    results = build(jobs, data, workers, options, soundfont) if jobs else {}
+    render_wav.record_results(jobs, results, keys, cache)
+
+    if args.report:
+        render_wav.write_report(results.values())
+    render_wav.finish_outputs(args, everything, formats, index)
+
+    success = cached + sum(1 for ok in results.values() if ok)
+    failed = [p for p, ok in results.items() if not ok]
+    if failed:
+        print(f"\n--- FAILED ({len(failed)}) ---")
+        for midi_path in sorted(failed):
+            print(f"  {os.path.relpath(midi_path, MIDI_DIR)}")
+
+    print(f"\n=== Done! {success}/{len(all_jobs)} files built to {WAV_DIR} ===")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,70 +14,403 @@ Aesthetic approach:
 """
 
 import os
+import json
 import random
-from mido import MidiFile, MidiTrack, Message, MetaMessage
-
-random.seed(42)  # Reproducible but "random" feeling
+import hashlib
+import inspect
+import struct
+import argparse
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+from mido import Message, MetaMessage
+
+SEED = 42  # Reproducible but "random" feeling
+
+# Each generator draws from its own stream, seeded from SEED and the
+# generator's name (see run_generator), so a file's content never depends
+# on which generators ran before it, and generators can run in any order
+# or in parallel.
+rng = random.Random(SEED)
 
 OUT = os.path.dirname(os.path.abspath(__file__))
 TICKS = 480  # Ticks per beat
 
+# --- Event Buffer ---
+# Tracks hold their events as parallel array columns (delta, type, channel,
+# data1, data2) rather than one mido.Message object per event, and are
+# written straight to Standard MIDI File bytes. Uncompacted, the writer
+# matches mido's output byte for byte (running status, trailing
+# end_of_track); save() compacts (see Compactor).
+#
+# A repeated phrase is built once as a Pattern and placed by reference: the
+# track stores one row per placement, and the copies (with their per-copy
+# velocity/pitch-bend transforms) only exist while the file is serialized.
+
+NOTE_OFF, NOTE_ON, CONTROL_CHANGE, PROGRAM_CHANGE, PITCHWHEEL = 0x80, 0x90, 0xB0, 0xC0, 0xE0
+META = 0xFF
+PATTERN = 0x00  # Row that places a Pattern by reference (see place)
+END_OF_TRACK = b"\xff\x2f\x00"
+SET_TEMPO = 0x51
+
+def varlen(n: int) -> bytes:
+    """MIDI variable-length quantity."""
+    out = [n & 0x7F]
+    n >>= 7
+    while n:
+        out.append(0x80 | (n & 0x7F))
+        n >>= 7
+    return bytes(reversed(out))
+
+class EventTrack:
+    """A MIDI track stored as array columns. Meta events keep their encoded
+    bytes (FF type len data) in `metas`, pattern placements their Placement
+    in `placements`, both keyed by row."""
+
+    def __init__(self):
+        self.delta = array("L")
+        self.type = array("B")
+        self.channel = array("B")
+        self.data1 = array("B")
+        self.data2 = array("B")
+        self.metas = {}
+        self.placements = {}
+
+    def __len__(self) -> int:
+        return len(self.type)
+
+    def add(self, kind: int, ch: int, data1: int, data2: int = 0, time: int = 0):
+        self.delta.append(time)
+        self.type.append(kind)
+        self.channel.append(ch)
+        self.data1.append(data1)
+        self.data2.append(data2)
+
+    def add_meta(self, raw: bytes, time: int = 0):
+        self.metas[len(self.type)] = raw
+        self.add(META, 0, 0, 0, time)
+
+    def append(self, msg):
+        """mido compatibility: accept a Message or MetaMessage."""
+        raw = bytes(msg.bytes())
+        if msg.is_meta:
+            self.add_meta(raw, msg.time)
+        else:
+            self.add(raw[0] & 0xF0, raw[0] & 0x0F, raw[1], raw[2] if len(raw) > 2 else 0, msg.time)
+
+    def events(self, rand: random.Random = None):
+        """Yield (delta, type, channel, data1, data2, meta bytes or None) with
+        every placed pattern expanded in place."""
+        metas = self.metas
+        carry = 0  # Delta of a placement row, moved onto its first event
+        for i, (delta, kind, ch, d1, d2) in enumerate(
+            zip(self.delta, self.type, self.channel, self.data1, self.data2)
+        ):
+            if kind != PATTERN:
+                yield delta + carry, kind, ch, d1, d2, metas.get(i)
+                carry = 0
+                continue
+            carry += delta
+            for event in self.placements[i].expand(rand):
+                if carry:
+                    event = (event[0] + carry,) + event[1:]
+                    carry = 0
+                yield event
+
+    def controls(self) -> set:
+        """(type, channel, data1) of every row, patterns included: enough to
+        tell which channel state (notes, bends, CCs) a track drives."""
+        seen = set(zip(self.type, self.channel, self.data1))
+        for placement in self.placements.values():
+            seen |= placement.pattern.controls()
+        return seen
+
+    def __iter__(self):
+        """Yield the events as mido messages (for inspection, not the hot path)."""
+        for delta, kind, ch, d1, d2, meta in self.events():
+            if kind == META:
+                yield MetaMessage.from_bytes(meta).copy(time=delta)
+            elif kind == PROGRAM_CHANGE:
+                yield Message.from_bytes([kind | ch, d1], time=delta)
+            else:
+                yield Message.from_bytes([kind | ch, d1, d2], time=delta)
+
+    def to_bytes(self, compactor=None) -> bytes:
+        """Encode as an MTrk chunk, optionally through a Compactor."""
+        events = compactor.filter(self.events()) if compactor else self.events()
+        data = bytearray()
+        running = None
+        for delta, kind, ch, d1, d2, meta in events:
+            if delta < 0x80:
+                data.append(delta)
+            else:
+                data += varlen(delta)
+            if kind == META:
+                data += meta
+                running = None
+                continue
+            status = kind | ch
+            if status != running:
+                data.append(status)
+                running = status
+            data.append(d1)
+            if kind != PROGRAM_CHANGE:
+                data.append(d2)
+        data += varlen(compactor.carry if compactor else 0) + END_OF_TRACK
+        return b"MTrk" + struct.pack(">L", len(data)) + bytes(data)
+
+class Pattern(EventTrack):
+    """A phrase built with the usual helpers, then placed with place()."""
+
+class Placement:
+    """One placement of a pattern: repeat count, transforms, and the seed
+    its random transforms are drawn from (so expansion is reproducible)."""
+
+    def __init__(self, pattern: Pattern, repeat: int, vel_jitter: tuple,
+                 bend: int, bend_jitter: int, seed: int):
+        self.pattern = pattern
+        self.repeat = repeat
+        self.vel_jitter = vel_jitter
+        self.bend = bend
+        self.bend_jitter = bend_jitter
+        self.seed = seed
+
+    def expand(self, rand: random.Random = None):
+        """Yield the pattern's events, repeat times, with transforms applied.
+        Nested placements draw from the outermost placement's stream.
+        Velocity jitter on a pitched channel is drawn once per onset tick,
+        so a chord's tones keep sharing one velocity as they did with a
+        single gvel(); on the percussion channel (9) every hit draws its
+        own, so a kick, snare and hat on one tick keep the groove's accents."""
+        r = rand or random.Random(self.seed)
+        lo, hi = self.vel_jitter
+        bend, spread = self.bend, self.bend_jitter
+        jitter = {}  # Velocity offset per pitched channel at the current onset tick
+        for _ in range(self.repeat):
+            for delta, kind, ch, d1, d2, meta in self.pattern.events(r):
+                if delta:
+                    jitter.clear()
+                if kind == NOTE_ON and d2 and (lo or hi):
+                    if ch == 9:
+                        offset = r.randint(lo, hi)
+                    elif ch in jitter:
+                        offset = jitter[ch]
+                    else:
+                        offset = jitter[ch] = r.randint(lo, hi)
+                    d2 = max(1, min(127, d2 + offset))
+                elif kind == PITCHWHEEL and (bend or spread):
+                    value = (d1 | d2 << 7) + bend + (r.randint(-spread, spread) if spread else 0)
+                    value = max(0, min(16383, value))
+                    d1, d2 = value & 0x7F, value >> 7
+                yield delta, kind, ch, d1, d2, meta
+
+class Compactor:
+    """Drops events that change nothing FluidSynth would render.
+
+    - rest() placeholders (note_off, channel 0, note 0): the delta moves to
+      the next event (or end_of_track), so every other event and the track
+      length keep their exact tick
+    - pitch bends and CCs that repeat the value already set, on channels
+      whose bends/that controller no other track of the file touches
+    - a meta event repeated at the same tick, and a set_tempo replaced by
+      another one at the same tick
+    """
+
+    def __init__(self, bends: set, controls: set, fold_rests: bool):
+        self.bends = bends  # Channels whose pitch bend this track alone sets
+        self.controls = controls  # (channel, controller) pairs this track alone sets
+        self.fold_rests = fold_rests  # False if some track really plays ch 0 note 0
+        self.removed = 0
+        self.carry = 0  # Delta still owed to the next event (end_of_track at the end)
+
+    def filter(self, events):
+        bend_state, cc_state = {}, {}
+        tick_metas = set()  # Meta events already written at the current tick
+        tempo = None  # set_tempo held back until the tick moves on
+        for delta, kind, ch, d1, d2, meta in events:
+            delta += self.carry
+            self.carry = 0
+            if delta:
+                tick_metas.clear()
+
+            if kind == META:
+                if meta in tick_metas:
+                    self.removed += 1
+                    continue
+                if meta[1] == SET_TEMPO:
+                    if tempo is not None and delta == 0:
+                        self.removed += 1
+                        delta = tempo[0]
+                    elif tempo is not None:
+                        yield tempo
+                    tempo = (delta, kind, ch, d1, d2, meta)
+                    continue
+                tick_metas.add(meta)
+            elif kind == NOTE_OFF and self.fold_rests and ch == 0 and d1 == 0:
+                self.removed += 1
+                self.carry = delta
+                continue
+            elif kind == PITCHWHEEL and ch in self.bends:
+                if bend_state.get(ch) == (d1, d2):
+                    self.removed += 1
+                    self.carry = delta
+                    continue
+                bend_state[ch] = (d1, d2)
+            elif kind == CONTROL_CHANGE and (ch, d1) in self.controls:
+                if cc_state.get((ch, d1)) == d2:
+                    self.removed += 1
+                    self.carry = delta
+                    continue
+                cc_state[ch, d1] = d2
+
+            if tempo is not None:
+                yield tempo
+                tempo = None
+            yield delta, kind, ch, d1, d2, meta
+        if tempo is not None:
+            yield tempo
+
+class EventFile:
+    """In-memory type 1 MIDI file made of EventTracks."""
+
+    def __init__(self, ticks_per_beat: int = TICKS):
+        self.ticks_per_beat = ticks_per_beat
+        self.tracks = []
+        self.removed = 0  # Events dropped by compaction in the last to_bytes()
+
+    def compactors(self) -> list:
+        """One Compactor per track. A bend/CC is only deduplicated on the
+        track that alone drives it: tracks are merged by time on playback,
+        so another track's values would interleave with it."""
+        controls = [track.controls() for track in self.tracks]
+        owners = {}
+        for i, seen in enumerate(controls):
+            for kind, ch, d1 in seen:
+                if kind == PITCHWHEEL:
+                    owners.setdefault((kind, ch), set()).add(i)
+                elif kind == CONTROL_CHANGE:
+                    owners.setdefault((kind, ch, d1), set()).add(i)
+        fold_rests = not any((NOTE_ON, 0, 0) in seen for seen in controls)
+        return [
+            Compactor(
+                bends={key[1] for key, o in owners.items() if key[0] == PITCHWHEEL and o == {i}},
+                controls={key[1:] for key, o in owners.items() if key[0] == CONTROL_CHANGE and o == {i}},
+                fold_rests=fold_rests,
+            )
+            for i in range(len(self.tracks))
+        ]
+
+    def to_bytes(self, compact: bool = True) -> bytes:
+        header = struct.pack(">hhh", 1, len(self.tracks), self.ticks_per_beat)
+        compactors = self.compactors() if compact else [None] * len(self.tracks)
+        chunks = [track.to_bytes(c) for track, c in zip(self.tracks, compactors)]
+        self.removed = sum(c.removed for c in compactors if c)
+        return b"MThd" + struct.pack(">L", 6) + header + b"".join(chunks)
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
 # --- MIDI Helpers ---
 
-def save(mid: MidiFile, category: str, name: str):
+# When not None, save() collects {name: (category, SMF bytes)} here instead
+# of writing files (see generate_in_memory).
+_captured = None
+
+def save(mid: EventFile, category: str, name: str):
+    if _captured is not None:
+        _captured[name] = (category, mid.to_bytes())
+        return
     path = os.path.join(OUT, "midi", category, f"{name}.mid")
     mid.save(path)
-    print(f"  -> {path}")
+    removed = f" (compacted: {mid.removed} event(s) removed)" if mid.removed else ""
+    print(f"  -> {path}{removed}")
 
-def new_midi(tempo_bpm: int = 120) -> MidiFile:
-    mid = MidiFile(ticks_per_beat=TICKS)
+def new_midi(tempo_bpm: int = 120) -> EventFile:
+    mid = EventFile(ticks_per_beat=TICKS)
     return mid
 
-def add_tempo(track: MidiTrack, bpm: int):
+def add_tempo(track: EventTrack, bpm: int):
     tempo = int(60_000_000 / bpm)
-    track.append(MetaMessage('set_tempo', tempo=tempo, time=0))
+    track.add_meta(b"\xff\x51\x03" + tempo.to_bytes(3, "big"))
 
-def add_name(track: MidiTrack, name: str):
-    track.append(MetaMessage('track_name', name=name, time=0))
+def add_name(track: EventTrack, name: str):
+    text = name.encode("latin1")
+    track.add_meta(b"\xff\x03" + varlen(len(text)) + text)
 
-def program(track: MidiTrack, ch: int, prog: int):
-    track.append(Message('program_change', channel=ch, program=prog, time=0))
+def program(track: EventTrack, ch: int, prog: int):
+    track.add(PROGRAM_CHANGE, ch, prog)
 
-def note(track: MidiTrack, ch: int, pitch: int, vel: int, dur: int, time: int = 0):
+def note_on(track: EventTrack, ch: int, pitch: int, vel: int, time: int = 0):
+    track.add(NOTE_ON, ch, pitch, vel, time)
+
+def note_off(track: EventTrack, ch: int, pitch: int, time: int = 0):
+    track.add(NOTE_OFF, ch, pitch, 0, time)
+
+def note(track: EventTrack, ch: int, pitch: int, vel: int, dur: int, time: int = 0):
     """Add a note with given duration in ticks."""
-    track.append(Message('note_on', channel=ch, note=pitch, velocity=vel, time=time))
-    track.append(Message('note_off', channel=ch, note=pitch, velocity=0, time=dur))
+    track.add(NOTE_ON, ch, pitch, vel, time)
+    track.add(NOTE_OFF, ch, pitch, 0, dur)
 
-def chord(track: MidiTrack, ch: int, pitches: list, vel: int, dur: int, time: int = 0):
+def chord(track: EventTrack, ch: int, pitches: list, vel: int, dur: int, time: int = 0):
     """Play multiple notes simultaneously."""
     for i, p in enumerate(pitches):
-        track.append(Message('note_on', channel=ch, note=p, velocity=vel, time=time if i == 0 else 0))
+        track.add(NOTE_ON, ch, p, vel, time if i == 0 else 0)
     for i, p in enumerate(pitches):
-        track.append(Message('note_off', channel=ch, note=p, velocity=0, time=dur if i == 0 else 0))
+        track.add(NOTE_OFF, ch, p, 0, dur if i == 0 else 0)
 
-def pitch_bend(track: MidiTrack, ch: int, value: int, time: int = 0):
+def pitch_bend(track: EventTrack, ch: int, value: int, time: int = 0):
     """Pitch bend: -8192=max down, 0=center, 8191=max up."""
-    clamped = max(-8192, min(8191, value))
-    track.append(Message('pitchwheel', channel=ch, pitch=clamped, time=time))
-
-def cc(track: MidiTrack, ch: int, control: int, value: int, time: int = 0):
-    track.append(Message('control_change', channel=ch, control=control, value=value, time=time))
-
-def rest(track: MidiTrack, ticks: int):
-    track.append(Message('note_off', channel=0, note=0, velocity=0, time=ticks))
+    clamped = max(-8192, min(8191, value)) + 8192
+    track.add(PITCHWHEEL, ch, clamped & 0x7F, clamped >> 7, time)
+
+def cc(track: EventTrack, ch: int, control: int, value: int, time: int = 0):
+    track.add(CONTROL_CHANGE, ch, control, value, time)
+
+def rest(track: EventTrack, ticks: int):
+    track.add(NOTE_OFF, 0, 0, 0, ticks)
+
+def place(track: EventTrack, pattern: Pattern, repeat: int = 1, time: int = 0,
+          vel_jitter: tuple = (0, 0), bend: int = 0, bend_jitter: int = 0):
+    """Place a pattern by reference, repeat times back to back.
+
+    Per-placement transforms, applied when the file is written:
+    vel_jitter=(lo, hi) adds a random offset to note velocities (one draw
+    per onset tick and channel, shared by a chord's tones, except on the
+    percussion channel where each hit draws its own), bend
+    shifts every pitch bend in the pattern and bend_jitter adds ±random to
+    each of them.
+    """
+    track.placements[len(track)] = Placement(
+        pattern, repeat, vel_jitter, bend, bend_jitter, rng.getrandbits(32))
+    track.add(PATTERN, 0, 0, 0, time)
 
 def beats(n: float) -> int:
     return int(TICKS * n)
 
 # Grungy velocity: mostly hard with random dips
+GVEL_JITTER = (-25, 15)
+
 def gvel(base: int = 100) -> int:
-    return max(1, min(127, base + random.randint(-25, 15)))
+    return max(1, min(127, base + rng.randint(*GVEL_JITTER)))
 
 # Detune: slight pitch bend wobble
-def detune_sequence(track: MidiTrack, ch: int, steps: int = 8, intensity: int = 300):
+def detune_sequence(track: EventTrack, ch: int, steps: int = 8, intensity: int = 300):
     for i in range(steps):
-        val = random.randint(-intensity, intensity)
-        pitch_bend(track, ch, random.randint(-intensity, intensity), time=beats(0.25))
+        val = rng.randint(-intensity, intensity)
+        pitch_bend(track, ch, rng.randint(-intensity, intensity), time=beats(0.25))
+
+# --- Generator Registry ---
+# Every generator registers its category and the files it writes. The
+# registry keeps definition order, which is also the sequential run order.
+
+REGISTRY = {}
+
+def generator(category: str, *outputs: str):
+    def register(fn):
+        REGISTRY[fn.__name__] = {"category": category, "outputs": list(outputs), "fn": fn}
+        return fn
+    return register
 
 # --- SCALES & CHORDS ---
 
@@ -104,18 +437,19 @@ def power_dirty(root: int) -> list:
 # MUSIC TRACKS
 # ============================================================
 
+@generator("music", "01_dungeon_ambient_floors1-3")
 def music_dungeon_ambient():
     """Floors 1-3: Low drone, distant drips, faint dissonance."""
     print("Generating: Dungeon Ambient (Floors 1-3)")
     mid = new_midi()
 
     # Track 0: Tempo
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 60)
     add_name(t0, "Dungeon Ambient")
 
     # Track 1: Deep organ drone
-    drone = MidiTrack(); mid.tracks.append(drone)
+    drone = EventTrack(); mid.tracks.append(drone)
     add_name(drone, "Drone")
     program(drone, 0, 19)  # Church Organ
     cc(drone, 0, 7, 70)  # Volume
@@ -129,19 +463,19 @@ def music_dungeon_ambient():
     for i, n in enumerate(drone_notes):
         vel = gvel(50)
         # Slow detune wobble
-        pitch_bend(drone, 0, random.randint(-200, 200), time=0)
+        pitch_bend(drone, 0, rng.randint(-200, 200), time=0)
         note(drone, 0, n, vel, beats(4))
 
     # Track 2: Dissonant string stabs (sparse)
-    strings = MidiTrack(); mid.tracks.append(strings)
+    strings = EventTrack(); mid.tracks.append(strings)
     add_name(strings, "Strings")
     program(strings, 1, 49)  # String Ensemble
     cc(strings, 1, 91, 110)  # Heavy reverb
 
     for bar in range(32):
-        if random.random() < 0.25:  # Only 25% of bars
+        if rng.random() < 0.25:  # Only 25% of bars
             # Cluster chord: close intervals = grungy
-            root = random.choice([38, 41, 44, 47])
+            root = rng.choice([38, 41, 44, 47])
             pitches = [root, root + 1, root + 5]  # Minor 2nd + 4th = nasty
             vel = gvel(40)
             chord(strings, 1, pitches, vel, beats(3))
@@ -150,30 +484,31 @@ def music_dungeon_ambient():
             rest(strings, beats(4))
 
     # Track 3: Percussion drips (channel 10)
-    perc = MidiTrack(); mid.tracks.append(perc)
+    perc = EventTrack(); mid.tracks.append(perc)
     add_name(perc, "Drips")
 
     for bar in range(32):
         for beat_idx in range(16):  # 16th note resolution
-            if random.random() < 0.06:  # Sparse random drips
+            if rng.random() < 0.06:  # Sparse random drips
                 # Use woodblock/click sounds
-                note(perc, 9, random.choice([75, 76, 77]), gvel(30), beats(0.125))
+                note(perc, 9, rng.choice([75, 76, 77]), gvel(30), beats(0.125))
             else:
                 rest(perc, beats(0.25))
 
     save(mid, "music", "01_dungeon_ambient_floors1-3")
 
+@generator("music", "02_dungeon_deep_floors4-6")
 def music_dungeon_deep():
     """Floors 4-6: Darker, deeper reverb, subtle dissonant strings."""
     print("Generating: Dungeon Deep (Floors 4-6)")
     mid = new_midi()
 
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 50)  # Slower = more dread
     add_name(t0, "Dungeon Deep")
 
     # Track 1: Sub bass drone
-    bass = MidiTrack(); mid.tracks.append(bass)
+    bass = EventTrack(); mid.tracks.append(bass)
     add_name(bass, "Sub Drone")
     program(bass, 0, 39)  # Synth Bass
     cc(bass, 0, 7, 90)
@@ -181,25 +516,25 @@ def music_dungeon_deep():
 
     # Deep drone with tritone shifts
     for bar in range(32):
-        root = random.choice([26, 28, 31, 33])  # Very low
+        root = rng.choice([26, 28, 31, 33])  # Very low
         # Hold root
         note(bass, 0, root, gvel(70), beats(3))
         # Tritone stab
         note(bass, 0, root + 6, gvel(50), beats(1))
 
     # Track 2: Creepy high strings
-    high = MidiTrack(); mid.tracks.append(high)
+    high = EventTrack(); mid.tracks.append(high)
     add_name(high, "High Strings")
     program(high, 1, 48)  # Strings tremolo
     cc(high, 1, 91, 120)
 
     for bar in range(32):
-        if random.random() < 0.2:
+        if rng.random() < 0.2:
             # Dissonant high cluster
-            root = random.choice([72, 74, 77, 79])
+            root = rng.choice([72, 74, 77, 79])
             pitches = [root, root + 1, root + 6]
             chord(high, 1, pitches, gvel(35), beats(6))
-        elif random.random() < 0.1:
+        elif rng.random() < 0.1:
             # Descending chromatic line
             for step in range(4):
                 note(high, 1, 76 - step, gvel(30), beats(1))
@@ -207,30 +542,31 @@ def music_dungeon_deep():
             rest(high, beats(4))
 
     # Track 3: Metallic percussion
-    metal = MidiTrack(); mid.tracks.append(metal)
+    metal = EventTrack(); mid.tracks.append(metal)
     add_name(metal, "Metal Hits")
 
     for bar in range(32):
         for sub in range(8):
-            if random.random() < 0.04:
+            if rng.random() < 0.04:
                 # Anvil/metal sounds
-                note(metal, 9, random.choice([56, 59, 80, 81]), gvel(45), beats(0.25))
+                note(metal, 9, rng.choice([56, 59, 80, 81]), gvel(45), beats(0.25))
             else:
                 rest(metal, beats(0.5))
 
     save(mid, "music", "02_dungeon_deep_floors4-6")
 
+@generator("music", "03_dungeon_abyss_floors7plus")
 def music_dungeon_abyss():
     """Floors 7+: Oppressive, industrial, hostile."""
     print("Generating: Dungeon Abyss (Floors 7+)")
     mid = new_midi()
 
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 70)
     add_name(t0, "Dungeon Abyss")
 
     # Track 1: Industrial bass pulse
-    bass = MidiTrack(); mid.tracks.append(bass)
+    bass = EventTrack(); mid.tracks.append(bass)
     add_name(bass, "Industrial Bass")
     program(bass, 0, 87)  # Lead (fifth)
     cc(bass, 0, 7, 100)
@@ -238,37 +574,37 @@ def music_dungeon_abyss():
 
     # Relentless low pulse with pitch bend sickness
     for bar in range(32):
-        root = random.choice([26, 28, 31])
+        root = rng.choice([26, 28, 31])
         for pulse in range(8):
-            pitch_bend(bass, 0, random.randint(-1000, 1000))
+            pitch_bend(bass, 0, rng.randint(-1000, 1000))
             vel = gvel(90) if pulse % 2 == 0 else gvel(60)
             note(bass, 0, root, vel, beats(0.4), time=beats(0.1) if pulse > 0 else 0)
 
     # Track 2: Noise texture (rapid clusters)
-    noise = MidiTrack(); mid.tracks.append(noise)
+    noise = EventTrack(); mid.tracks.append(noise)
     add_name(noise, "Noise Texture")
     program(noise, 1, 30)  # Overdriven Guitar
     cc(noise, 1, 7, 60)
     cc(noise, 1, 91, 90)
 
     for bar in range(32):
-        if random.random() < 0.35:
+        if rng.random() < 0.35:
             # Rapid cluster burst
-            for i in range(random.randint(4, 12)):
-                root = random.randint(36, 60)
+            for i in range(rng.randint(4, 12)):
+                root = rng.randint(36, 60)
                 pitches = [root, root + 1, root + 2]
-                vel = random.randint(20, 100)
+                vel = rng.randint(20, 100)
                 for j, p in enumerate(pitches):
-                    noise.append(Message('note_on', channel=1, note=p, velocity=vel, time=0))
-                dur = random.randint(beats(0.0625), beats(0.25))
+                    note_on(noise, 1, p, vel)
+                dur = rng.randint(beats(0.0625), beats(0.25))
                 for j, p in enumerate(pitches):
-                    noise.append(Message('note_off', channel=1, note=p, velocity=0, time=dur if j == 0 else 0))
+                    note_off(noise, 1, p, time=dur if j == 0 else 0)
             rest(noise, beats(1))
         else:
             rest(noise, beats(4))
 
     # Track 3: Heavy percussion
-    drums = MidiTrack(); mid.tracks.append(drums)
+    drums = EventTrack(); mid.tracks.append(drums)
     add_name(drums, "Drums")
 
     for bar in range(32):
@@ -278,31 +614,32 @@ def music_dungeon_abyss():
                 hits.append((36, gvel(110)))  # Kick
             if eighth % 4 == 2:
                 hits.append((38, gvel(100)))  # Snare
-            if random.random() < 0.3:
+            if rng.random() < 0.3:
                 hits.append((42, gvel(60)))  # Closed hi-hat
 
             if hits:
                 for i, (n, v) in enumerate(hits):
-                    drums.append(Message('note_on', channel=9, note=n, velocity=v, time=0))
-                drums.append(Message('note_off', channel=9, note=hits[0][0], velocity=0, time=beats(0.5)))
+                    note_on(drums, 9, n, v)
+                note_off(drums, 9, hits[0][0], time=beats(0.5))
                 for i, (n, v) in enumerate(hits[1:]):
-                    drums.append(Message('note_off', channel=9, note=n, velocity=0, time=0))
+                    note_off(drums, 9, n)
             else:
                 rest(drums, beats(0.5))
 
     save(mid, "music", "03_dungeon_abyss_floors7plus")
 
+@generator("music", "04_menu_theme")
 def music_menu_theme():
     """Slow, foreboding organ/choir. Gothic."""
     print("Generating: Menu Theme")
     mid = new_midi()
 
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 55)
     add_name(t0, "Menu Theme")
 
     # Track 1: Church organ - main voice
-    organ = MidiTrack(); mid.tracks.append(organ)
+    organ = EventTrack(); mid.tracks.append(organ)
     add_name(organ, "Organ")
     program(organ, 0, 19)  # Church Organ
     cc(organ, 0, 7, 85)
@@ -323,11 +660,11 @@ def music_menu_theme():
     for _ in range(2):
         for pitches, dur in progression:
             vel = gvel(65)
-            pitch_bend(organ, 0, random.randint(-100, 100))
+            pitch_bend(organ, 0, rng.randint(-100, 100))
             chord(organ, 0, pitches, vel, beats(dur))
 
     # Track 2: Choir pad
-    choir = MidiTrack(); mid.tracks.append(choir)
+    choir = EventTrack(); mid.tracks.append(choir)
     add_name(choir, "Choir")
     program(choir, 1, 52)  # Choir Aahs
     cc(choir, 1, 7, 60)
@@ -342,24 +679,25 @@ def music_menu_theme():
     for _ in range(1):
         for pitches, dur in choir_notes:
             if pitches:
-                pitch_bend(choir, 1, random.randint(-150, 150))
+                pitch_bend(choir, 1, rng.randint(-150, 150))
                 chord(choir, 1, pitches, gvel(45), beats(dur))
             else:
                 rest(choir, beats(dur))
 
     save(mid, "music", "04_menu_theme")
 
+@generator("music", "05_combat_tension")
 def music_combat_tension():
     """Percussive, driving, medieval urgency."""
     print("Generating: Combat Tension")
     mid = new_midi()
 
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 140)
     add_name(t0, "Combat Tension")
 
     # Track 1: Driving distorted bass
-    bass = MidiTrack(); mid.tracks.append(bass)
+    bass = EventTrack(); mid.tracks.append(bass)
     add_name(bass, "Bass")
     program(bass, 0, 30)  # Overdriven Guitar
     cc(bass, 0, 7, 100)
@@ -371,17 +709,18 @@ def music_combat_tension():
         [33, 33, 0, 33, 39, 0, 33, 36,  33, 33, 0, 39, 33, 0, 36, 31],
         [38, 38, 0, 38, 44, 0, 38, 41,  46, 44, 0, 41, 38, 0, 36, 38],
     ]
-    for _ in range(4):  # 4 repeats of all patterns
-        for pattern in riff_patterns:
-            for n in pattern:
-                if n > 0:
-                    pitch_bend(bass, 0, random.randint(-400, 400))
-                    note(bass, 0, n, gvel(105), beats(0.4))
-                else:
-                    rest(bass, beats(0.5))
+    riff = Pattern()
+    for pattern in riff_patterns:
+        for n in pattern:
+            if n > 0:
+                pitch_bend(riff, 0, 0)
+                note(riff, 0, n, 105, beats(0.4))
+            else:
+                rest(riff, beats(0.5))
+    place(bass, riff, repeat=4, vel_jitter=GVEL_JITTER, bend_jitter=400)  # 4 repeats of all patterns
 
     # Track 2: Aggressive drums
-    drums = MidiTrack(); mid.tracks.append(drums)
+    drums = EventTrack(); mid.tracks.append(drums)
     add_name(drums, "Drums")
 
     kick_pattern =  [1,0,0,1,1,0,0,0, 1,0,0,1,1,0,1,0]
@@ -396,19 +735,19 @@ def music_combat_tension():
             if snare_pattern[i]:
                 events.append((38, gvel(105)))
             if hh_pattern[i]:
-                events.append((42 if random.random() > 0.2 else 46, gvel(70)))
+                events.append((42 if rng.random() > 0.2 else 46, gvel(70)))
 
             if events:
                 for j, (n, v) in enumerate(events):
-                    drums.append(Message('note_on', channel=9, note=n, velocity=v, time=0))
-                drums.append(Message('note_off', channel=9, note=events[0][0], velocity=0, time=beats(0.25)))
+                    note_on(drums, 9, n, v)
+                note_off(drums, 9, events[0][0], time=beats(0.25))
                 for j, (n, v) in enumerate(events[1:]):
-                    drums.append(Message('note_off', channel=9, note=n, velocity=0, time=0))
+                    note_off(drums, 9, n)
             else:
                 rest(drums, beats(0.25))
 
     # Track 3: Stab chords
-    stabs = MidiTrack(); mid.tracks.append(stabs)
+    stabs = EventTrack(); mid.tracks.append(stabs)
     add_name(stabs, "Stabs")
     program(stabs, 2, 29)  # Overdriven Guitar
     cc(stabs, 2, 7, 80)
@@ -417,52 +756,57 @@ def music_combat_tension():
         power_dirty(38), None, None, power(44), None, power_dirty(41), None, None,
         power_dirty(38), None, power(46), None, power_dirty(44), None, power(36), None,
     ]
-    for _ in range(32):
-        for s in stab_chords:
-            if s:
-                chord(stabs, 2, s, gvel(100), beats(0.4))
-            else:
-                rest(stabs, beats(0.5))
+    bar = Pattern()
+    for s in stab_chords:
+        if s:
+            chord(bar, 2, s, 100, beats(0.4))
+        else:
+            rest(bar, beats(0.5))
+    place(stabs, bar, repeat=32, vel_jitter=GVEL_JITTER)
 
     save(mid, "music", "05_combat_tension")
 
+@generator("music", "06_boss_fight")
 def music_boss_fight():
     """Full orchestral/metal hybrid. Heavy, escalating."""
     print("Generating: Boss Fight")
     mid = new_midi()
 
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 155)
     add_name(t0, "Boss Fight")
 
     # Track 1: Double bass drum assault
-    drums = MidiTrack(); mid.tracks.append(drums)
+    drums = EventTrack(); mid.tracks.append(drums)
     add_name(drums, "Drums")
 
-    # Phase 1: Steady pummel (16 bars)
-    for bar in range(16):
+    # Phase 1: Steady pummel (16 bars: a 4-bar phrase, 4 times)
+    pummel = Pattern()
+    for bar in range(4):
         for sixteenth in range(16):
             events = []
             # Double kick on every 16th
-            events.append((36, gvel(120)))
+            events.append((36, 120))
             # Snare on 2 and 4
             if sixteenth in [4, 12]:
-                events.append((38, gvel(115)))
-            # Crash on bar start
-            if sixteenth == 0 and bar % 4 == 0:
-                events.append((49, gvel(100)))
+                events.append((38, 115))
+            # Crash on phrase start
+            if sixteenth == 0 and bar == 0:
+                events.append((49, 100))
             # Hi-hat
             if sixteenth % 2 == 0:
-                events.append((42, gvel(75)))
+                events.append((42, 75))
 
             for j, (n, v) in enumerate(events):
-                drums.append(Message('note_on', channel=9, note=n, velocity=v, time=0))
-            drums.append(Message('note_off', channel=9, note=events[0][0], velocity=0, time=beats(0.25)))
+                note_on(pummel, 9, n, v)
+            note_off(pummel, 9, events[0][0], time=beats(0.25))
             for j, (n, v) in enumerate(events[1:]):
-                drums.append(Message('note_off', channel=9, note=n, velocity=0, time=0))
+                note_off(pummel, 9, n)
+    place(drums, pummel, repeat=4, vel_jitter=GVEL_JITTER)
 
-    # Phase 2: Breakdown (8 bars) - half time
-    for bar in range(8):
+    # Phase 2: Breakdown (8 bars: a 2-bar phrase, 4 times) - half time
+    breakdown = Pattern()
+    for bar in range(2):
         for eighth in range(8):
             events = []
             if eighth in [0, 4]:
@@ -474,22 +818,24 @@ def music_boss_fight():
 
             if events:
                 for j, (n, v) in enumerate(events):
-                    drums.append(Message('note_on', channel=9, note=n, velocity=v, time=0))
-                drums.append(Message('note_off', channel=9, note=events[0][0], velocity=0, time=beats(0.5)))
+                    note_on(breakdown, 9, n, v)
+                note_off(breakdown, 9, events[0][0], time=beats(0.5))
                 for j, (n, v) in enumerate(events[1:]):
-                    drums.append(Message('note_off', channel=9, note=n, velocity=0, time=0))
+                    note_off(breakdown, 9, n)
             else:
-                rest(drums, beats(0.5))
+                rest(breakdown, beats(0.5))
+    place(drums, breakdown, repeat=4)
 
     # Phase 3: Blast beats (8 bars)
-    for bar in range(8):
-        for sixteenth in range(16):
-            n = 36 if sixteenth % 2 == 0 else 38
-            drums.append(Message('note_on', channel=9, note=n, velocity=gvel(120), time=0))
-            drums.append(Message('note_off', channel=9, note=n, velocity=0, time=beats(0.25)))
+    blast = Pattern()
+    for sixteenth in range(16):
+        n = 36 if sixteenth % 2 == 0 else 38
+        note_on(blast, 9, n, 120)
+        note_off(blast, 9, n, time=beats(0.25))
+    place(drums, blast, repeat=8, vel_jitter=GVEL_JITTER)
 
     # Track 2: Distorted power chord riff
-    guitar = MidiTrack(); mid.tracks.append(guitar)
+    guitar = EventTrack(); mid.tracks.append(guitar)
     add_name(guitar, "Guitar")
     program(guitar, 0, 30)  # Overdriven Guitar
     cc(guitar, 0, 7, 110)
@@ -500,16 +846,17 @@ def music_boss_fight():
         (power_dirty(36), 0.5), (power_dirty(38), 0.25), (None, 0.25),
         (power_dirty(44), 0.25), (power(46), 0.25), (power_dirty(38), 0.5),
     ]
-    for _ in range(24):
-        for notes, dur in boss_riff:
-            if notes:
-                pitch_bend(guitar, 0, random.randint(-600, 600))
-                chord(guitar, 0, notes, gvel(115), beats(dur * 0.9))
-            else:
-                rest(guitar, beats(dur))
+    riff = Pattern()
+    for notes, dur in boss_riff:
+        if notes:
+            pitch_bend(riff, 0, 0)
+            chord(riff, 0, notes, 115, beats(dur * 0.9))
+        else:
+            rest(riff, beats(dur))
+    place(guitar, riff, repeat=24, vel_jitter=GVEL_JITTER, bend_jitter=600)
 
     # Track 3: Choir stabs
-    choir = MidiTrack(); mid.tracks.append(choir)
+    choir = EventTrack(); mid.tracks.append(choir)
     add_name(choir, "Choir")
     program(choir, 1, 52)  # Choir
     cc(choir, 1, 7, 90)
@@ -521,12 +868,13 @@ def music_boss_fight():
         ([58, 62, 65], 4), (None, 4),
         ([62, 65, 69], 1), ([60, 65, 68], 1), ([58, 62, 65], 1), (None, 1),
     ]
-    for _ in range(8):
-        for pitches, dur in choir_stabs:
-            if pitches:
-                chord(choir, 1, pitches, gvel(90), beats(dur * 0.95))
-            else:
-                rest(choir, beats(dur))
+    stabs = Pattern()
+    for pitches, dur in choir_stabs:
+        if pitches:
+            chord(stabs, 1, pitches, 90, beats(dur * 0.95))
+        else:
+            rest(stabs, beats(dur))
+    place(choir, stabs, repeat=8, vel_jitter=GVEL_JITTER)
 
     save(mid, "music", "06_boss_fight")
 
@@ -534,14 +882,15 @@ def music_boss_fight():
 # STINGERS
 # ============================================================
 
+@generator("stingers", "07_floor_clear")
 def stinger_floor_clear():
     """Triumphant brass swell, ~3 seconds."""
     print("Generating: Floor Clear stinger")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 120)
 
-    brass = MidiTrack(); mid.tracks.append(brass)
+    brass = EventTrack(); mid.tracks.append(brass)
     program(brass, 0, 61)  # Brass Section
     cc(brass, 0, 91, 100)
 
@@ -553,15 +902,16 @@ def stinger_floor_clear():
 
     save(mid, "stingers", "07_floor_clear")
 
+@generator("stingers", "08_game_over")
 def stinger_game_over():
     """Low mournful bell toll + decay, ~4 seconds."""
     print("Generating: Game Over stinger")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 50)
 
     # Tubular bell
-    bell = MidiTrack(); mid.tracks.append(bell)
+    bell = EventTrack(); mid.tracks.append(bell)
     program(bell, 0, 14)  # Tubular Bells
     cc(bell, 0, 91, 127)
 
@@ -572,14 +922,15 @@ def stinger_game_over():
 
     save(mid, "stingers", "08_game_over")
 
+@generator("stingers", "09_floor_descent")
 def stinger_floor_descent():
     """Descending chromatic passage, ~2 seconds."""
     print("Generating: Floor Descent stinger")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 140)
 
-    desc = MidiTrack(); mid.tracks.append(desc)
+    desc = EventTrack(); mid.tracks.append(desc)
     program(desc, 0, 19)  # Organ
     cc(desc, 0, 91, 110)
 
@@ -587,7 +938,7 @@ def stinger_floor_descent():
     for i in range(12):
         p = 60 - i
         v = 100 - i * 5
-        pitch_bend(desc, 0, random.randint(-300, 300))
+        pitch_bend(desc, 0, rng.randint(-300, 300))
         note(desc, 0, p, v, beats(0.25))
 
     # Low impact
@@ -599,15 +950,16 @@ def stinger_floor_descent():
 # PLAYER SOUNDS
 # ============================================================
 
+@generator("player", *[f"10_footstep_stone_var{i}" for i in range(1, 5)])
 def player_footsteps():
     """4 variations of heavy boot on stone."""
     print("Generating: Player Footsteps (x4)")
     for var in range(4):
         mid = new_midi()
-        t0 = MidiTrack(); mid.tracks.append(t0)
+        t0 = EventTrack(); mid.tracks.append(t0)
         add_tempo(t0, 120)
 
-        step = MidiTrack(); mid.tracks.append(step)
+        step = EventTrack(); mid.tracks.append(step)
         # Use different percussion for each variation
         hits = [
             [(36, 90), (38, 40)],   # Kick + ghost snare
@@ -616,13 +968,14 @@ def player_footsteps():
             [(36, 88), (37, 35)],   # Kick + sidestick
         ]
         for n, v in hits[var]:
-            step.append(Message('note_on', channel=9, note=n, velocity=v + random.randint(-5, 5), time=0))
-        step.append(Message('note_off', channel=9, note=hits[var][0][0], velocity=0, time=beats(0.15)))
+            note_on(step, 9, n, v + rng.randint(-5, 5))
+        note_off(step, 9, hits[var][0][0], time=beats(0.15))
         for n, v in hits[var][1:]:
-            step.append(Message('note_off', channel=9, note=n, velocity=0, time=0))
+            note_off(step, 9, n)
 
         save(mid, "player", f"10_footstep_stone_var{var+1}")
 
+@generator("player", "12_breathing_idle", "13_breathing_active", "14_breathing_low_hp")
 def player_breathing():
     """3 states: idle, active, low HP."""
     print("Generating: Player Breathing (3 states)")
@@ -634,10 +987,10 @@ def player_breathing():
     ]
     for name, vel_base, speed, bpm, bars in states:
         mid = new_midi()
-        t0 = MidiTrack(); mid.tracks.append(t0)
+        t0 = EventTrack(); mid.tracks.append(t0)
         add_tempo(t0, bpm)
 
-        breath = MidiTrack(); mid.tracks.append(breath)
+        breath = EventTrack(); mid.tracks.append(breath)
         program(breath, 0, 121)  # Breath Noise
         cc(breath, 0, 91, 80)
 
@@ -651,123 +1004,129 @@ def player_breathing():
 
         save(mid, "player", name)
 
+@generator("player", "15_sword_swing")
 def player_sword_swing():
     """Metallic whoosh."""
     print("Generating: Sword Swing")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 120)
 
-    swing = MidiTrack(); mid.tracks.append(swing)
+    swing = EventTrack(); mid.tracks.append(swing)
     program(swing, 0, 121)  # Breath Noise (for whoosh)
     cc(swing, 0, 91, 60)
 
     # Fast pitch bend sweep = whoosh
     pitch_bend(swing, 0, -4192)
-    swing.append(Message('note_on', channel=0, note=72, velocity=90, time=0))
+    note_on(swing, 0, 72, 90)
     for i in range(8):
         pitch_bend(swing, 0, -4192 + i * 1200, time=beats(0.04))
-    swing.append(Message('note_off', channel=0, note=72, velocity=0, time=beats(0.1)))
+    note_off(swing, 0, 72, time=beats(0.1))
 
     save(mid, "player", "15_sword_swing")
 
+@generator("player", "16_sword_hit_flesh")
 def player_sword_hit():
     """Wet impact + bone crack."""
     print("Generating: Sword Hit Flesh")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 120)
 
-    hit = MidiTrack(); mid.tracks.append(hit)
+    hit = EventTrack(); mid.tracks.append(hit)
     # Layered percussion for impact
     for n, v in [(38, 120), (39, 100), (75, 80), (36, 110)]:
-        hit.append(Message('note_on', channel=9, note=n, velocity=v, time=0))
-    hit.append(Message('note_off', channel=9, note=38, velocity=0, time=beats(0.2)))
+        note_on(hit, 9, n, v)
+    note_off(hit, 9, 38, time=beats(0.2))
     for n in [39, 75, 36]:
-        hit.append(Message('note_off', channel=9, note=n, velocity=0, time=0))
+        note_off(hit, 9, n)
 
     # Short pitched thud
-    thud = MidiTrack(); mid.tracks.append(thud)
+    thud = EventTrack(); mid.tracks.append(thud)
     program(thud, 1, 117)  # Taiko
     pitch_bend(thud, 1, -2192)
     note(thud, 1, 36, 110, beats(0.3))
 
     save(mid, "player", "16_sword_hit_flesh")
 
+@generator("player", "17_sword_miss")
 def player_sword_miss():
     """Extended whoosh, no impact."""
     print("Generating: Sword Miss")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 120)
 
-    miss = MidiTrack(); mid.tracks.append(miss)
+    miss = EventTrack(); mid.tracks.append(miss)
     program(miss, 0, 121)  # Breath Noise
     cc(miss, 0, 91, 70)
 
     pitch_bend(miss, 0, -5192)
-    miss.append(Message('note_on', channel=0, note=72, velocity=70, time=0))
+    note_on(miss, 0, 72, 70)
     for i in range(12):
         pitch_bend(miss, 0, -5192 + i * 800, time=beats(0.04))
-    miss.append(Message('note_off', channel=0, note=72, velocity=0, time=beats(0.2)))
+    note_off(miss, 0, 72, time=beats(0.2))
 
     save(mid, "player", "17_sword_miss")
 
+@generator("player", *[f"18_player_hurt_var{i}" for i in range(1, 4)])
 def player_hurt():
     """3 variations of pain grunt."""
     print("Generating: Player Hurt (x3)")
     for var in range(3):
         mid = new_midi()
-        t0 = MidiTrack(); mid.tracks.append(t0)
+        t0 = EventTrack(); mid.tracks.append(t0)
         add_tempo(t0, 120)
 
-        grunt = MidiTrack(); mid.tracks.append(grunt)
+        grunt = EventTrack(); mid.tracks.append(grunt)
         program(grunt, 0, 121)  # Breath Noise
 
         pitches = [55, 52, 58]
-        pitch_bend(grunt, 0, random.randint(-2000, 2000))
+        pitch_bend(grunt, 0, rng.randint(-2000, 2000))
         note(grunt, 0, pitches[var], gvel(110), beats(0.3))
 
         # Impact hit layered
-        hit = MidiTrack(); mid.tracks.append(hit)
+        hit = EventTrack(); mid.tracks.append(hit)
         note(hit, 9, 38, gvel(90), beats(0.15))
 
         save(mid, "player", f"18_player_hurt_var{var+1}")
 
+@generator("player", "19_player_death")
 def player_death():
     """Final groan + collapse thud."""
     print("Generating: Player Death")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 80)
 
-    groan = MidiTrack(); mid.tracks.append(groan)
+    groan = EventTrack(); mid.tracks.append(groan)
     program(groan, 0, 121)  # Breath Noise
     cc(groan, 0, 91, 100)
 
     # Descending groan
     pitch_bend(groan, 0, 808)
-    groan.append(Message('note_on', channel=0, note=55, velocity=100, time=0))
+    note_on(groan, 0, 55, 100)
     for i in range(16):
         pitch_bend(groan, 0, 808 - i * 400, time=beats(0.1))
-    groan.append(Message('note_off', channel=0, note=55, velocity=0, time=beats(0.2)))
+    note_off(groan, 0, 55, time=beats(0.2))
 
     # Body thud
-    thud = MidiTrack(); mid.tracks.append(thud)
+    thud = EventTrack(); mid.tracks.append(thud)
     rest(thud, beats(1.5))
     note(thud, 9, 36, 120, beats(0.5))
     note(thud, 9, 36, 60, beats(0.3))
 
     save(mid, "player", "19_player_death")
 
+@generator("player", "20_heartbeat_low_hp")
 def player_heartbeat():
     """Slow thumping heartbeat loop for low HP."""
     print("Generating: Heartbeat Low HP")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 70)
 
-    heart = MidiTrack(); mid.tracks.append(heart)
+    heart = EventTrack(); mid.tracks.append(heart)
     # Low taiko-like double thump
     program(heart, 0, 117)  # Taiko
     cc(heart, 0, 7, 100)
@@ -785,147 +1144,154 @@ def player_heartbeat():
 # SKELETON ENEMY SOUNDS
 # ============================================================
 
+@generator("skeleton", *[f"21_bone_footstep_var{i}" for i in range(1, 4)])
 def skeleton_footsteps():
     """3 variations of bone clicking on stone."""
     print("Generating: Skeleton Footsteps (x3)")
     for var in range(3):
         mid = new_midi()
-        t0 = MidiTrack(); mid.tracks.append(t0)
+        t0 = EventTrack(); mid.tracks.append(t0)
         add_tempo(t0, 120)
 
-        bones = MidiTrack(); mid.tracks.append(bones)
+        bones = EventTrack(); mid.tracks.append(bones)
         clicks = [
             [(75, 80), (76, 50)],  # Claves + woodblock
             [(76, 75), (77, 45)],  # Woodblock variants
             [(75, 85), (37, 30)],  # Claves + sidestick
         ]
         for n, v in clicks[var]:
-            bones.append(Message('note_on', channel=9, note=n, velocity=v + random.randint(-8, 8), time=0))
-        bones.append(Message('note_off', channel=9, note=clicks[var][0][0], velocity=0, time=beats(0.1)))
+            note_on(bones, 9, n, v + rng.randint(-8, 8))
+        note_off(bones, 9, clicks[var][0][0], time=beats(0.1))
         for n, v in clicks[var][1:]:
-            bones.append(Message('note_off', channel=9, note=n, velocity=0, time=0))
+            note_off(bones, 9, n)
 
         save(mid, "skeleton", f"21_bone_footstep_var{var+1}")
 
+@generator("skeleton", "22_bone_rattle_idle")
 def skeleton_rattle_idle():
     """Subtle creaking/rattling loop."""
     print("Generating: Skeleton Idle Rattle")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 90)
 
-    rattle = MidiTrack(); mid.tracks.append(rattle)
+    rattle = EventTrack(); mid.tracks.append(rattle)
     # Maracas + woodblock taps
     for _ in range(16):
-        if random.random() < 0.4:
-            n = random.choice([70, 75, 76, 69])
-            rattle.append(Message('note_on', channel=9, note=n, velocity=random.randint(20, 50), time=0))
-            rattle.append(Message('note_off', channel=9, note=n, velocity=0, time=beats(random.uniform(0.1, 0.3))))
+        if rng.random() < 0.4:
+            n = rng.choice([70, 75, 76, 69])
+            note_on(rattle, 9, n, rng.randint(20, 50))
+            note_off(rattle, 9, n, time=beats(rng.uniform(0.1, 0.3)))
         else:
-            rest(rattle, beats(random.uniform(0.3, 0.8)))
+            rest(rattle, beats(rng.uniform(0.3, 0.8)))
 
     save(mid, "skeleton", "22_bone_rattle_idle")
 
+@generator("skeleton", "23_skeleton_attack")
 def skeleton_attack():
     """Sharp bone strike."""
     print("Generating: Skeleton Attack")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 120)
 
-    atk = MidiTrack(); mid.tracks.append(atk)
+    atk = EventTrack(); mid.tracks.append(atk)
     # Fast aggressive percussion burst
     for n, v in [(75, 110), (38, 100), (76, 90)]:
-        atk.append(Message('note_on', channel=9, note=n, velocity=v, time=0))
-    atk.append(Message('note_off', channel=9, note=75, velocity=0, time=beats(0.15)))
+        note_on(atk, 9, n, v)
+    note_off(atk, 9, 75, time=beats(0.15))
     for n in [38, 76]:
-        atk.append(Message('note_off', channel=9, note=n, velocity=0, time=0))
+        note_off(atk, 9, n)
 
     save(mid, "skeleton", "23_skeleton_attack")
 
+@generator("skeleton", "24_skeleton_aggro")
 def skeleton_aggro():
     """Hollow screech when detecting player."""
     print("Generating: Skeleton Aggro")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 120)
 
-    screech = MidiTrack(); mid.tracks.append(screech)
+    screech = EventTrack(); mid.tracks.append(screech)
     program(screech, 0, 121)  # Breath Noise
     cc(screech, 0, 91, 90)
 
     # Rising screech
     pitch_bend(screech, 0, -2192)
-    screech.append(Message('note_on', channel=0, note=80, velocity=100, time=0))
+    note_on(screech, 0, 80, 100)
     for i in range(6):
         pitch_bend(screech, 0, -2192 + i * 1500, time=beats(0.08))
-    screech.append(Message('note_off', channel=0, note=80, velocity=0, time=beats(0.15)))
+    note_off(screech, 0, 80, time=beats(0.15))
 
     save(mid, "skeleton", "24_skeleton_aggro")
 
+@generator("skeleton", *[f"25_skeleton_hit_var{i}" for i in range(1, 3)])
 def skeleton_hit():
     """2 variations of bone impact."""
     print("Generating: Skeleton Hit (x2)")
     for var in range(2):
         mid = new_midi()
-        t0 = MidiTrack(); mid.tracks.append(t0)
+        t0 = EventTrack(); mid.tracks.append(t0)
         add_tempo(t0, 120)
 
-        hit = MidiTrack(); mid.tracks.append(hit)
+        hit = EventTrack(); mid.tracks.append(hit)
         if var == 0:
             for n, v in [(75, 100), (76, 80), (38, 60)]:
-                hit.append(Message('note_on', channel=9, note=n, velocity=v, time=0))
-            hit.append(Message('note_off', channel=9, note=75, velocity=0, time=beats(0.2)))
+                note_on(hit, 9, n, v)
+            note_off(hit, 9, 75, time=beats(0.2))
             for n in [76, 38]:
-                hit.append(Message('note_off', channel=9, note=n, velocity=0, time=0))
+                note_off(hit, 9, n)
         else:
             for n, v in [(76, 95), (37, 85), (75, 70)]:
-                hit.append(Message('note_on', channel=9, note=n, velocity=v, time=0))
-            hit.append(Message('note_off', channel=9, note=76, velocity=0, time=beats(0.18)))
+                note_on(hit, 9, n, v)
+            note_off(hit, 9, 76, time=beats(0.18))
             for n in [37, 75]:
-                hit.append(Message('note_off', channel=9, note=n, velocity=0, time=0))
+                note_off(hit, 9, n)
 
         save(mid, "skeleton", f"25_skeleton_hit_var{var+1}")
 
+@generator("skeleton", "26_skeleton_death")
 def skeleton_death():
     """Bones scattering and collapsing."""
     print("Generating: Skeleton Death")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 120)
 
-    death = MidiTrack(); mid.tracks.append(death)
+    death = EventTrack(); mid.tracks.append(death)
     # Cascade of bone hits
     bone_sounds = [75, 76, 77, 75, 76, 37, 75, 76, 36]
     for i, n in enumerate(bone_sounds):
         vel = 100 - i * 8
-        death.append(Message('note_on', channel=9, note=n, velocity=max(vel, 20), time=0))
-        death.append(Message('note_off', channel=9, note=n, velocity=0, time=beats(random.uniform(0.05, 0.15))))
+        note_on(death, 9, n, max(vel, 20))
+        note_off(death, 9, n, time=beats(rng.uniform(0.05, 0.15)))
 
     # Final collapse
     rest(death, beats(0.2))
     for n, v in [(36, 80), (38, 50)]:
-        death.append(Message('note_on', channel=9, note=n, velocity=v, time=0))
-    death.append(Message('note_off', channel=9, note=36, velocity=0, time=beats(0.4)))
-    death.append(Message('note_off', channel=9, note=38, velocity=0, time=0))
+        note_on(death, 9, n, v)
+    note_off(death, 9, 36, time=beats(0.4))
+    note_off(death, 9, 38)
 
     save(mid, "skeleton", "26_skeleton_death")
 
+@generator("skeleton", "27_skeleton_ambient_nearby")
 def skeleton_ambient():
     """Faint bone creaks heard through walls."""
     print("Generating: Skeleton Ambient Nearby")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 80)
 
-    amb = MidiTrack(); mid.tracks.append(amb)
+    amb = EventTrack(); mid.tracks.append(amb)
     # Very quiet random bone taps
     for _ in range(20):
-        if random.random() < 0.3:
-            n = random.choice([75, 76, 77])
-            amb.append(Message('note_on', channel=9, note=n, velocity=random.randint(10, 30), time=0))
-            amb.append(Message('note_off', channel=9, note=n, velocity=0, time=beats(random.uniform(0.05, 0.1))))
-        rest(amb, beats(random.uniform(0.5, 2.0)))
+        if rng.random() < 0.3:
+            n = rng.choice([75, 76, 77])
+            note_on(amb, 9, n, rng.randint(10, 30))
+            note_off(amb, 9, n, time=beats(rng.uniform(0.05, 0.1)))
+        rest(amb, beats(rng.uniform(0.5, 2.0)))
 
     save(mid, "skeleton", "27_skeleton_ambient_nearby")
 
@@ -933,15 +1299,16 @@ def skeleton_ambient():
 # ENVIRONMENT SOUNDS
 # ============================================================
 
+@generator("environment", *[f"28_water_drip_var{i}" for i in range(1, 4)])
 def env_water_drips():
     """3 variations of drip with echo."""
     print("Generating: Water Drips (x3)")
     for var in range(3):
         mid = new_midi()
-        t0 = MidiTrack(); mid.tracks.append(t0)
+        t0 = EventTrack(); mid.tracks.append(t0)
         add_tempo(t0, 120)
 
-        drip = MidiTrack(); mid.tracks.append(drip)
+        drip = EventTrack(); mid.tracks.append(drip)
         program(drip, 0, 96)  # Rain/FX
         cc(drip, 0, 91, 127)  # Max reverb
 
@@ -953,36 +1320,38 @@ def env_water_drips():
 
         save(mid, "environment", f"28_water_drip_var{var+1}")
 
+@generator("environment", "29_wind_draft")
 def env_wind_draft():
     """Low moaning wind loop."""
     print("Generating: Wind Draft")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 50)
 
-    wind = MidiTrack(); mid.tracks.append(wind)
+    wind = EventTrack(); mid.tracks.append(wind)
     program(wind, 0, 121)  # Breath Noise
     cc(wind, 0, 7, 50)
     cc(wind, 0, 91, 120)
 
     for _ in range(8):
         # Slow pitch sweep = wind
-        pitch_bend(wind, 0, -1192 + random.randint(-500, 500))
-        wind.append(Message('note_on', channel=0, note=48, velocity=gvel(35), time=0))
+        pitch_bend(wind, 0, -1192 + rng.randint(-500, 500))
+        note_on(wind, 0, 48, gvel(35))
         for i in range(8):
-            pitch_bend(wind, 0, -1192 + int(1000 * random.uniform(-1, 1)), time=beats(0.5))
-        wind.append(Message('note_off', channel=0, note=48, velocity=0, time=beats(0.5)))
+            pitch_bend(wind, 0, -1192 + int(1000 * rng.uniform(-1, 1)), time=beats(0.5))
+        note_off(wind, 0, 48, time=beats(0.5))
 
     save(mid, "environment", "29_wind_draft")
 
+@generator("environment", "30_stone_creak")
 def env_stone_creak():
     """Settling stone sound."""
     print("Generating: Stone Creak")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 120)
 
-    creak = MidiTrack(); mid.tracks.append(creak)
+    creak = EventTrack(); mid.tracks.append(creak)
     program(creak, 0, 117)  # Taiko Drum (deep)
     cc(creak, 0, 91, 100)
 
@@ -993,14 +1362,15 @@ def env_stone_creak():
 
     save(mid, "environment", "30_stone_creak")
 
+@generator("environment", "31_distant_rumble")
 def env_distant_rumble():
     """Deep underground tremor."""
     print("Generating: Distant Rumble")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 60)
 
-    rumble = MidiTrack(); mid.tracks.append(rumble)
+    rumble = EventTrack(); mid.tracks.append(rumble)
     program(rumble, 0, 117)  # Taiko
     cc(rumble, 0, 91, 127)
     cc(rumble, 0, 7, 80)
@@ -1008,59 +1378,61 @@ def env_distant_rumble():
     # Low roll
     for i in range(16):
         vel = int(40 + 50 * (i / 16) * (1 - i / 20))
-        pitch_bend(rumble, 0, random.randint(-500, 500))
-        note(rumble, 0, 24 + random.randint(-2, 2), vel, beats(0.2))
+        pitch_bend(rumble, 0, rng.randint(-500, 500))
+        note(rumble, 0, 24 + rng.randint(-2, 2), vel, beats(0.2))
 
     save(mid, "environment", "31_distant_rumble")
 
+@generator("environment", "32_chains_rattle")
 def env_chains():
     """Metal chains clinking."""
     print("Generating: Chains Rattle")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 100)
 
-    chains = MidiTrack(); mid.tracks.append(chains)
+    chains = EventTrack(); mid.tracks.append(chains)
     # Triangle + bell tree = metallic clinks
     for _ in range(8):
-        n = random.choice([81, 80, 56, 53])  # Triangle, bell, cowbell, ride bell
-        chains.append(Message('note_on', channel=9, note=n, velocity=random.randint(30, 70), time=0))
-        chains.append(Message('note_off', channel=9, note=n, velocity=0, time=beats(random.uniform(0.1, 0.4))))
-        rest(chains, beats(random.uniform(0.1, 0.5)))
+        n = rng.choice([81, 80, 56, 53])  # Triangle, bell, cowbell, ride bell
+        note_on(chains, 9, n, rng.randint(30, 70))
+        note_off(chains, 9, n, time=beats(rng.uniform(0.1, 0.4)))
+        rest(chains, beats(rng.uniform(0.1, 0.5)))
 
     save(mid, "environment", "32_chains_rattle")
 
+@generator("environment", "33_torch_crackle", "34_torch_flare")
 def env_torch():
     """Torch crackle loop + flare."""
     print("Generating: Torch Crackle + Flare")
     # Crackle loop
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 120)
 
-    crackle = MidiTrack(); mid.tracks.append(crackle)
+    crackle = EventTrack(); mid.tracks.append(crackle)
     # Rapid quiet percussion = fire crackle
     for _ in range(64):
-        if random.random() < 0.6:
-            n = random.choice([75, 76, 77, 69, 70])
-            crackle.append(Message('note_on', channel=9, note=n, velocity=random.randint(15, 45), time=0))
-            crackle.append(Message('note_off', channel=9, note=n, velocity=0, time=beats(random.uniform(0.03, 0.1))))
-        rest(crackle, beats(random.uniform(0.05, 0.15)))
+        if rng.random() < 0.6:
+            n = rng.choice([75, 76, 77, 69, 70])
+            note_on(crackle, 9, n, rng.randint(15, 45))
+            note_off(crackle, 9, n, time=beats(rng.uniform(0.03, 0.1)))
+        rest(crackle, beats(rng.uniform(0.05, 0.15)))
 
     save(mid, "environment", "33_torch_crackle")
 
     # Flare
     mid2 = new_midi()
-    t02 = MidiTrack(); mid2.tracks.append(t02)
+    t02 = EventTrack(); mid2.tracks.append(t02)
     add_tempo(t02, 120)
 
-    flare = MidiTrack(); mid2.tracks.append(flare)
+    flare = EventTrack(); mid2.tracks.append(flare)
     # Sudden burst of crackle + whoosh
     for i in range(12):
-        n = random.choice([75, 76, 77, 69])
+        n = rng.choice([75, 76, 77, 69])
         v = 80 - i * 5
-        flare.append(Message('note_on', channel=9, note=n, velocity=max(v, 15), time=0))
-        flare.append(Message('note_off', channel=9, note=n, velocity=0, time=beats(0.04)))
+        note_on(flare, 9, n, max(v, 15))
+        note_off(flare, 9, n, time=beats(0.04))
 
     save(mid, "environment", "34_torch_flare")
 
@@ -1068,42 +1440,45 @@ def env_torch():
 # UI / INTERACTION SOUNDS
 # ============================================================
 
+@generator("ui", "35_menu_hover")
 def ui_menu_hover():
     """Subtle stone scrape."""
     print("Generating: Menu Hover")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 120)
 
-    hover = MidiTrack(); mid.tracks.append(hover)
+    hover = EventTrack(); mid.tracks.append(hover)
     program(hover, 0, 14)  # Tubular Bells
     cc(hover, 0, 91, 80)
     note(hover, 0, 72, 50, beats(0.3))
 
     save(mid, "ui", "35_menu_hover")
 
+@generator("ui", "36_menu_select")
 def ui_menu_select():
     """Deep bell tone."""
     print("Generating: Menu Select")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 120)
 
-    sel = MidiTrack(); mid.tracks.append(sel)
+    sel = EventTrack(); mid.tracks.append(sel)
     program(sel, 0, 14)  # Tubular Bells
     cc(sel, 0, 91, 100)
     chord(sel, 0, [48, 55, 60], 100, beats(1.5))
 
     save(mid, "ui", "36_menu_select")
 
+@generator("ui", "37_menu_back")
 def ui_menu_back():
     """Softer reverse of select."""
     print("Generating: Menu Back")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 120)
 
-    back = MidiTrack(); mid.tracks.append(back)
+    back = EventTrack(); mid.tracks.append(back)
     program(back, 0, 14)  # Tubular Bells
     cc(back, 0, 91, 80)
     note(back, 0, 60, 60, beats(0.3))
@@ -1111,15 +1486,16 @@ def ui_menu_back():
 
     save(mid, "ui", "37_menu_back")
 
+@generator("ui", "38_blueprint_found")
 def ui_blueprint_found():
     """Zelda-style item fanfare! Ascending arpeggio, bright, triumphant."""
     print("Generating: Blueprint Found (Zelda fanfare)")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 140)
 
     # Track 1: Main melody (bright trumpet/horn)
-    melody = MidiTrack(); mid.tracks.append(melody)
+    melody = EventTrack(); mid.tracks.append(melody)
     program(melody, 0, 56)  # Trumpet
     cc(melody, 0, 91, 90)
 
@@ -1134,7 +1510,7 @@ def ui_blueprint_found():
         note(melody, 0, p, v, beats(d))
 
     # Track 2: Harmony
-    harmony = MidiTrack(); mid.tracks.append(harmony)
+    harmony = EventTrack(); mid.tracks.append(harmony)
     program(harmony, 1, 46)  # Harp
     cc(harmony, 1, 91, 100)
 
@@ -1142,7 +1518,7 @@ def ui_blueprint_found():
     chord(harmony, 1, [62, 66, 69, 74], 90, beats(1.5))
 
     # Track 3: Sparkle
-    sparkle = MidiTrack(); mid.tracks.append(sparkle)
+    sparkle = EventTrack(); mid.tracks.append(sparkle)
     program(sparkle, 2, 10)  # Glockenspiel
     rest(sparkle, beats(0.75))
     for i in range(6):
@@ -1150,14 +1526,15 @@ def ui_blueprint_found():
 
     save(mid, "ui", "38_blueprint_found")
 
+@generator("ui", "39_item_pickup")
 def ui_item_pickup():
     """Quick sparkle/chime."""
     print("Generating: Item Pickup")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 120)
 
-    chime = MidiTrack(); mid.tracks.append(chime)
+    chime = EventTrack(); mid.tracks.append(chime)
     program(chime, 0, 10)  # Glockenspiel
     cc(chime, 0, 91, 90)
     note(chime, 0, 79, 80, beats(0.15))
@@ -1165,21 +1542,22 @@ def ui_item_pickup():
 
     save(mid, "ui", "39_item_pickup")
 
+@generator("ui", "40_stairs_found")
 def ui_stairs_found():
     """Ominous descending tone + stone grinding."""
     print("Generating: Stairs Found")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 90)
 
-    tone = MidiTrack(); mid.tracks.append(tone)
+    tone = EventTrack(); mid.tracks.append(tone)
     program(tone, 0, 19)  # Church Organ
     cc(tone, 0, 91, 110)
 
     # Descending ominous
     for i in range(6):
         p = 55 - i * 2
-        pitch_bend(tone, 0, random.randint(-400, 400))
+        pitch_bend(tone, 0, rng.randint(-400, 400))
         note(tone, 0, p, gvel(70), beats(0.5))
 
     # Low rumble
@@ -1187,27 +1565,29 @@ def ui_stairs_found():
 
     save(mid, "ui", "40_stairs_found")
 
+@generator("ui", "42_score_tick")
 def ui_score_tick():
     """Tiny click for score incrementing."""
     print("Generating: Score Tick")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 120)
 
-    tick = MidiTrack(); mid.tracks.append(tick)
-    tick.append(Message('note_on', channel=9, note=76, velocity=50, time=0))  # Woodblock
-    tick.append(Message('note_off', channel=9, note=76, velocity=0, time=beats(0.05)))
+    tick = EventTrack(); mid.tracks.append(tick)
+    note_on(tick, 9, 76, 50)  # Woodblock
+    note_off(tick, 9, 76, time=beats(0.05))
 
     save(mid, "ui", "42_score_tick")
 
+@generator("ui", "43_health_warning_pulse")
 def ui_health_warning():
     """Dull alarm pulse synced with HP bar."""
     print("Generating: Health Warning Pulse")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 70)
 
-    alarm = MidiTrack(); mid.tracks.append(alarm)
+    alarm = EventTrack(); mid.tracks.append(alarm)
     program(alarm, 0, 19)  # Organ
     cc(alarm, 0, 7, 60)
     cc(alarm, 0, 91, 80)
@@ -1218,26 +1598,27 @@ def ui_health_warning():
 
     save(mid, "ui", "43_health_warning_pulse")
 
+@generator("ui", "44_floor_transition_whoosh")
 def ui_floor_transition():
     """Rushing wind during floor change."""
     print("Generating: Floor Transition Whoosh")
     mid = new_midi()
-    t0 = MidiTrack(); mid.tracks.append(t0)
+    t0 = EventTrack(); mid.tracks.append(t0)
     add_tempo(t0, 120)
 
-    whoosh = MidiTrack(); mid.tracks.append(whoosh)
+    whoosh = EventTrack(); mid.tracks.append(whoosh)
     program(whoosh, 0, 121)  # Breath Noise
     cc(whoosh, 0, 91, 110)
     cc(whoosh, 0, 7, 90)
 
     # Build up
     pitch_bend(whoosh, 0, -4192)
-    whoosh.append(Message('note_on', channel=0, note=60, velocity=40, time=0))
+    note_on(whoosh, 0, 60, 40)
     for i in range(20):
         vel_ramp = min(127, 40 + i * 5)
         pitch_bend(whoosh, 0, -4192 + i * 400, time=beats(0.1))
         cc(whoosh, 0, 7, vel_ramp, time=0)
-    whoosh.append(Message('note_off', channel=0, note=60, velocity=0, time=beats(0.2)))
+    note_off(whoosh, 0, 60, time=beats(0.2))
 
     save(mid, "ui", "44_floor_transition_whoosh")
 
@@ -1246,58 +1627,189 @@ def ui_floor_transition():
 # MAIN
 # ============================================================
 
-if __name__ == "__main__":
+SECTIONS = {
+    "music": "MUSIC TRACKS",
+    "stingers": "STINGERS",
+    "player": "PLAYER SOUNDS",
+    "skeleton": "SKELETON SOUNDS",
+    "environment": "ENVIRONMENT SOUNDS",
+    "ui": "UI SOUNDS",
+}
+
+CACHE_FILE = os.path.join(OUT, "midi", ".generator_cache.json")
+
+
+def generator_rng(name: str) -> random.Random:
+    """Deterministic per-generator stream: same seed + name, same numbers."""
+    return random.Random(f"{SEED}:{name}")
+
+
+def run_generator(name: str) -> str:
+    """Run one generator (by function name) on its own RNG stream."""
+    global rng
+    rng = generator_rng(name)
+    REGISTRY[name]["fn"]()
+    return name
+
+
+def generate_in_memory(name: str) -> dict:
+    """Run one generator without touching the disk.
+
+    Returns {output name: (category, SMF bytes)}.
+    """
+    global _captured
+    _captured = {}
+    try:
+        run_generator(name)
+        return _captured
+    finally:
+        _captured = None
+
+
+def _code_names(code) -> set:
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if hasattr(const, "co_names"):  # Nested comprehensions/lambdas
+            names |= _code_names(const)
+    return names
+
+
+def dependencies(name: str) -> list:
+    """Module-level helpers, classes and constants a generator uses,
+    transitively (a class pulls in its methods). Absolute paths are left
+    out: they depend on where the repo is checked out, not on the music."""
+    module = globals()
+    seen = set()
+    pending = [REGISTRY[name]["fn"]]
+    while pending:
+        fn = pending.pop()
+        for dep in _code_names(fn.__code__):
+            value = module.get(dep)
+            if dep in seen or dep in REGISTRY or value is None:
+                continue
+            if isinstance(value, type) and value.__module__ == __name__:
+                seen.add(dep)
+                pending.extend(v for v in vars(value).values() if inspect.isfunction(v))
+            elif callable(value) and getattr(value, "__module__", None) == __name__:
+                seen.add(dep)
+                pending.append(value)
+            elif isinstance(value, str) and os.path.isabs(value):
+                continue  # Path constants (OUT, …) differ between clones
+            elif isinstance(value, (int, float, str, bytes, list, tuple, dict)):
+                seen.add(dep)
+    return sorted(seen)
+
+
+@lru_cache(maxsize=None)
+def dependency_source(dep: str) -> str:
+    value = globals()[dep]
+    return inspect.getsource(value) if callable(value) else repr(value)
+
+
+def source_hash(name: str) -> str:
+    """Hash of everything that decides a generator's output: seed, how its
+    RNG stream is derived and run, its own source, and the source/value of
+    every helper and constant it uses."""
+    h = hashlib.sha256(str(SEED).encode())
+    h.update(inspect.getsource(generator_rng).encode())
+    h.update(inspect.getsource(run_generator).encode())
+    h.update(inspect.getsource(REGISTRY[name]["fn"]).encode())
+    for dep in dependencies(name):
+        h.update(dep.encode())
+        h.update(dependency_source(dep).encode())
+    return h.hexdigest()
+
+
+def outputs_exist(name: str) -> bool:
+    entry = REGISTRY[name]
+    return all(
+        os.path.exists(os.path.join(OUT, "midi", entry["category"], f"{out}.mid"))
+        for out in entry["outputs"]
+    )
+
+
+def load_cache() -> dict:
+    try:
+        with open(CACHE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache: dict):
+    with open(CACHE_FILE, "w") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+
+
+def select(only: str, match: str) -> list:
+    """Registry names filtered by --only categories and --match substring."""
+    categories = {c.strip() for c in only.split(",") if c.strip()}
+    names = []
+    for name, entry in REGISTRY.items():
+        if categories and entry["category"] not in categories:
+            continue
+        if match and match not in name and not any(match in o for o in entry["outputs"]):
+            continue
+        names.append(name)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate all game audio as MIDI files.")
+    parser.add_argument(
+        "--only", default="",
+        help=f"comma-separated categories to build ({', '.join(SECTIONS)})",
+    )
+    parser.add_argument(
+        "--match", default="",
+        help="only generators whose name or output name contains this text",
+    )
+    parser.add_argument("--list", action="store_true", help="list matching generators and exit")
+    parser.add_argument(
+        "-f", "--force", action="store_true",
+        help="regenerate even if the generator's source hash is unchanged",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1,
+        help="run generators on N worker processes (0 = one per CPU core, default: 1)",
+    )
+    args = parser.parse_args()
+
+    names = select(args.only, args.match)
+    cache = load_cache()  # Always loaded: --force must not drop unselected hashes
+    hashes = {name: source_hash(name) for name in names}
+    stale = [n for n in names
+             if args.force or cache.get(n) != hashes[n] or not outputs_exist(n)]
+
+    if args.list:
+        for name in names:
+            entry = REGISTRY[name]
+            status = "stale" if name in stale else "ok"
+            print(f"{name:<24} {entry['category']:<12} {status:<6} {', '.join(entry['outputs'])}")
+            print(f"{'':<24} deps: {', '.join(dependencies(name)) or '-'}")
+        return
+
     print("=== DungeonSlopper MIDI Generator ===\n")
+    if len(stale) < len(names):
+        print(f"Up to date: {len(names) - len(stale)}, generating: {len(stale)}")
+
+    if args.jobs == 1:
+        section = None
+        for name in stale:
+            if REGISTRY[name]["category"] != section:
+                section = REGISTRY[name]["category"]
+                print(f"\n--- {SECTIONS[section]} ---")
+            run_generator(name)
+            cache[name] = hashes[name]
+    else:
+        workers = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for name in pool.map(run_generator, stale):
+                cache[name] = hashes[name]
+
+    save_cache(cache)
+    print(f"\n=== Done! {len(stale)} generator(s) saved to {os.path.join(OUT, 'midi')} ===")
 
-    print("\n--- MUSIC TRACKS ---")
-    music_dungeon_ambient()
-    music_dungeon_deep()
-    music_dungeon_abyss()
-    music_menu_theme()
-    music_combat_tension()
-    music_boss_fight()
-
-    print("\n--- STINGERS ---")
-    stinger_floor_clear()
-    stinger_game_over()
-    stinger_floor_descent()
-
-    print("\n--- PLAYER SOUNDS ---")
-    player_footsteps()
-    player_breathing()
-    player_sword_swing()
-    player_sword_hit()
-    player_sword_miss()
-    player_hurt()
-    player_death()
-    player_heartbeat()
-
-    print("\n--- SKELETON SOUNDS ---")
-    skeleton_footsteps()
-    skeleton_rattle_idle()
-    skeleton_attack()
-    skeleton_aggro()
-    skeleton_hit()
-    skeleton_death()
-    skeleton_ambient()
-
-    print("\n--- ENVIRONMENT SOUNDS ---")
-    env_water_drips()
-    env_wind_draft()
-    env_stone_creak()
-    env_distant_rumble()
-    env_chains()
-    env_torch()
-
-    print("\n--- UI SOUNDS ---")
-    ui_menu_hover()
-    ui_menu_select()
-    ui_menu_back()
-    ui_blueprint_found()
-    ui_item_pickup()
-    ui_stairs_found()
-    ui_score_tick()
-    ui_health_warning()
-    ui_floor_transition()
-
-    print(f"\n=== Done! All MIDI files saved to {os.path.join(OUT, 'midi')} ===")
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,11 @@
 DungeonSlopper MIDI → Grungy WAV Renderer
 
 Pipeline:
-  1. FluidSynth renders MIDI → clean WAV (via subprocess)
+  1. FluidSynth renders MIDI → clean audio (in-process via pyfluidsynth,
+     or a fluidsynth subprocess writing a clean WAV as fallback)
   2. Pedalboard applies category-specific grungy effects
-  3. Output: cohesive but distinct sound per category
+  3. Output: cohesive but distinct sound per category, as WAV and/or
+     Ogg Vorbis / Opus (per-category bitrate) / FLAC (archival)
 
 Effect philosophy:
   - Everything shares a "dungeon reverb" base (large, dark, damp)
@@ -15,9 +17,29 @@ Effect philosophy:
   - UI: cleanest, but still lo-fi
 """
 
+import io
 import os
+import re
+import json
+import sys
+import time
+import shutil
+import cProfile
+import csv
+import hashlib
+import argparse
+import resource
+import asyncio
+import threading
+import tracemalloc
+import importlib.util
+import multiprocessing
+from contextlib import contextmanager
 import subprocess
 import glob
+from ctypes import c_int, c_size_t, c_void_p
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import mido
 import numpy as np
 import soundfile as sf
 from pedalboard import (
@@ -25,6 +47,12 @@ from pedalboard import (
     HighpassFilter, LowpassFilter, Compressor, Gain,
     HighShelfFilter, LowShelfFilter,
 )
+from pedalboard.io import AudioFile, StreamResampler
+
+try:
+    import fluidsynth  # pyfluidsynth: in-process synthesis backend
+except ImportError:  # missing package or libfluidsynth; use the subprocess
+    fluidsynth = None
 
 # --- Config ---
 
@@ -34,6 +62,109 @@ WAV_DIR = os.path.join(BASE, "wav")
 SOUNDFONT = os.path.join(BASE, "soundfonts", "GeneralUser_GS.sf2")
 SAMPLE_RATE = 44100
 FLUIDSYNTH = "fluidsynth"
+SYNTH_GAIN = 0.5
+SYNTH_BLOCK = 4096  # Frames per fluid_synth_write_float call
+SPRITE_DIR = os.path.join(BASE, "sprites")
+SEGMENT_DIR = os.path.join(BASE, "segments")  # --segments chunks + playlists
+REPORT_DIR = os.path.join(BASE, "reports")  # --report / --profile output
+DIST_DIR = os.path.join(BASE, "dist")  # Content-hashed copies + manifest.json
+TARGET_DIR = os.path.join(BASE, "targets")  # --targets outputs, one tree per target
+MANIFEST_URL_BASE = "/audio/"  # Where BASE is served from (see audioEvents.ts)
+EVENTS_SOURCE = os.path.join(BASE, "..", "src", "audio", "audioEvents.ts")
+CONTEXT_RATE = 48000  # AudioContext rate decodeAudioData resamples to (typical)
+SPRITE_GAP_SECONDS = 0.05  # Silence between sprite entries (decoder/resampler guard)
+STREAM_BLOCK = 65536  # Frames per block in --stream mode
+SCAN_BLOCK = 4096  # Frames per step of the reverse silence scan
+SILENCE_THRESHOLD = 0.001
+TAIL_SECONDS = 0.5  # Audio kept after the last audible sample
+CACHE_FILE = os.path.join(WAV_DIR, ".render_cache.json")
+ONSET_FILE = os.path.join(WAV_DIR, ".onsets.json")  # Lead-in cut by --trim-onsets
+INDEX_FILE = os.path.join(WAV_DIR, ".midi_index.json")
+INDEX_VERSION = 4  # Bump when analyze_midi() records something new
+CATEGORIES = ["music", "stingers", "player", "skeleton", "environment", "ui"]
+
+# Output formats (--formats). WAV lands in WAV_DIR as before; every other
+# format gets its own tree next to it (audio/ogg/<category>/…, etc.).
+# Opus only supports 48 kHz among the common rates, so it is resampled.
+# Lossless formats are the masters (sprites and segments are cut from the
+# WAVs) and the archive, so they always stay at SAMPLE_RATE.
+OUTPUT_FORMATS = {
+    "wav":  {"ext": ".wav", "lossless": True},
+    "ogg":  {"ext": ".ogg"},
+    "opus": {"ext": ".opus", "sample_rate": 48000},
+    "flac": {"ext": ".flac", "lossless": True},
+}
+
+# Output sample rate. Every chain ends in a LowpassFilter, so at 44.1 kHz
+# the top of the spectrum holds nothing but the noise floor. Lossy outputs
+# are written at the lowest standard rate whose Nyquist frequency sits
+# RATE_HEADROOM times above the chain's lowest cutoff (--full-rate keeps
+# SAMPLE_RATE). The headroom is an octave because Pedalboard's lowpass is
+# first-order (6 dB/oct) and some chains distort after it. Formats with a
+# fixed rate (Opus) keep it, and lossless formats ignore it. A resampled
+# output is normalized again after resampling, whose overshoot can push
+# it past the 0.9 peak the post stage set.
+STANDARD_RATES = [16000, 22050, 24000, 32000, 44100, 48000]
+RATE_HEADROOM = 2.0
+
+# Render targets (--targets). Each target is one deliverable with its own
+# tree, TARGET_DIR/<target>/<category>/<name>.<ext>, plus a sizes.json
+# report. All targets share one synth + FX + post pass per asset; only the
+# resample/downmix/encode stage runs per target, on its own thread.
+# sample_rate None keeps the format's rate (the chain's output rate for a
+# lossy format, SAMPLE_RATE for a lossless one; Opus is always 48 kHz);
+# channels 1 downmixes, None keeps whatever the mix stage decided.
+RENDER_TARGETS = {
+    "archive": {"format": "flac", "sample_rate": 44100, "channels": None},
+    "desktop": {"format": "opus", "sample_rate": None, "channels": None},
+    "mobile":  {"format": "ogg", "sample_rate": 22050, "channels": 1},
+}
+
+# Mono collapse. A file is written mono when its post-FX channels are
+# effectively identical: correlation at MONO_MIN_CORRELATION or better and
+# side (L-R) energy at least MONO_MAX_SIDE_DB below the mid (L+R). Every
+# chain's Reverb is full width, so few renders get there on their own.
+# CHANNEL_MODE overrides per asset ("<category>/<name>") or per category:
+# "stereo" never collapses, "mono" always does, anything else decides per
+# file. The "mono" entries below are a deliberate narrowing, not a
+# measurement: rapid-fire, very short cues whose reverb width (side ~14-17
+# dB under mid) does not survive in the mix, so halving them is worth it.
+MONO_MIN_CORRELATION = 0.99
+MONO_MAX_SIDE_DB = -30.0
+CHANNEL_MODE = {
+    "music": "stereo",  # Keep the loops' reverb width
+    **{f"player/10_footstep_stone_var{i}": "mono" for i in range(1, 5)},
+    "ui/35_menu_hover": "mono",
+    "ui/36_menu_select": "mono",
+    "ui/37_menu_back": "mono",
+    "ui/42_score_tick": "mono",
+}
+
+# Onset trimming (--trim-onsets). Synthesis leaves some attack delay before
+# the first audible sample, and every game trigger pays it as latency. For
+# one-shots in ONSET_TRIM_CATEGORIES, leading silence is cut to
+# ONSET_PAD_SECONDS before FX, and after FX the tail is cut where it sinks
+# under the category's noise floor. The lead-in removed per asset goes to
+# ONSET_FILE and from there into the manifest and sprite index as
+# "onset_trimmed" (seconds). Loops keep their silence: it is part of the
+# period.
+ONSET_TRIM_CATEGORIES = ["player", "skeleton", "environment", "ui"]
+ONSET_PAD_SECONDS = 0.005
+NOISE_TAIL_SECONDS = 0.02  # Kept after the FX tail drops under the noise floor
+
+# Lossy bitrates in kbps per category. Every chain ends in a 12-15 bit
+# Bitcrush and a 5-10 kHz lowpass, so these are generous. Vorbis values
+# must be one of the encoder presets (64, 80, 96, 112, 128, 160, ...).
+ENCODE_BITRATE = {
+    "ogg": {
+        "music": 128, "stingers": 112, "player": 96,
+        "skeleton": 96, "environment": 80, "ui": 80,
+    },
+    "opus": {
+        "music": 96, "stingers": 80, "player": 64,
+        "skeleton": 64, "environment": 48, "ui": 48,
+    },
+}
 
 # --- Effect Chains (per category) ---
 # Each returns a Pedalboard + optional post-process function
@@ -179,6 +310,92 @@ CATEGORY_FX = {
     "ui": fx_ui,
 }
 
+# Noise floor intensity per category (Step 5)
+NOISE_INTENSITY = {
+    "music": 0.0015,
+    "stingers": 0.001,
+    "player": 0.002,
+    "skeleton": 0.0015,
+    "environment": 0.0025,
+    "ui": 0.0008,
+}
+
+
+# --- Game Events ---
+# Which rendered assets back each AudioEvent and whether the game loops
+# them, read from SOUND_MANIFEST in src/audio/audioEvents.ts (variants in
+# order) so the two cannot drift. Looping assets stay standalone files;
+# only one-shots are packed into sprites.
+
+def load_event_assets(path: str = EVENTS_SOURCE) -> dict:
+    """{event: ([asset, ...], loop)} from the client's SOUND_MANIFEST."""
+    with open(path) as f:
+        source = f.read()
+    events = {}
+    for match in re.finditer(r"\[AudioEvent\.(\w+)\]:\s*\{(.*?)\}", source, re.S):
+        body = match.group(2)
+        assets = re.findall(r"'/audio/wav/([^']+)\.wav'", body)
+        loop = re.search(r"loop:\s*(true|false)", body)
+        if not assets or loop is None:
+            raise ValueError(f"{path}: cannot parse the entry for {match.group(1)}")
+        events[match.group(1)] = (assets, loop.group(1) == "true")
+    if not events:
+        raise ValueError(f"{path}: no SOUND_MANIFEST entries found")
+    return events
+
+
+_event_assets = None
+
+
+def event_assets() -> dict:
+    """load_event_assets(), read on first use so importing this module does
+    not need the client tree."""
+    global _event_assets
+    if _event_assets is None:
+        _event_assets = load_event_assets()
+    return _event_assets
+
+
+def asset_events(asset: str):
+    """[(event, variant)] for every event that plays the given asset."""
+    return [
+        (event, variant)
+        for event, (assets, _) in event_assets().items()
+        for variant, a in enumerate(assets) if a == asset
+    ]
+
+
+def is_looping(asset: str) -> bool:
+    return any(loop for assets, loop in event_assets().values() if asset in assets)
+
+
+def resolve_fx(filename: str, category: str):
+    """Pick the effect chain factory for a file. Returns (factory, fx_name)."""
+    if filename in SPECIAL_FX:
+        return SPECIAL_FX[filename], filename
+    return CATEGORY_FX.get(category, fx_ui), category
+
+
+def output_rate(factory, full_rate: bool = False) -> int:
+    """Sample rate to write a chain's lossy outputs at (see STANDARD_RATES)."""
+    cutoffs = [p.cutoff_frequency_hz for p in factory() if isinstance(p, LowpassFilter)]
+    if full_rate or not cutoffs:
+        return SAMPLE_RATE
+    needed = 2 * RATE_HEADROOM * min(cutoffs)
+    return next((rate for rate in STANDARD_RATES if needed <= rate < SAMPLE_RATE), SAMPLE_RATE)
+
+
+def asset_rate(asset: str, full_rate: bool = False) -> int:
+    """output_rate() of the chain an asset is rendered with."""
+    category, filename = asset.split("/", 1)
+    factory, _ = resolve_fx(filename, category)
+    return output_rate(factory, full_rate)
+
+
+def format_rate(fmt: str, rate: int = None):
+    """The rate to hand EncodedWriter for fmt: None (SAMPLE_RATE) if lossless."""
+    return None if OUTPUT_FORMATS[fmt].get("lossless") else rate
+
 
 def add_noise(audio: np.ndarray, intensity: float = 0.003) -> np.ndarray:
     """Add subtle noise floor for analog grit."""
@@ -186,17 +403,165 @@ def add_noise(audio: np.ndarray, intensity: float = 0.003) -> np.ndarray:
     return audio + noise
 
 
-def render_midi_to_wav(midi_path: str, wav_path: str):
-    """Render a MIDI file to WAV using FluidSynth."""
-    cmd = [
+# --- Post-FX stage (trim scan, noise, normalize) ---
+# Works in place on float32 buffers. The noise generator and buffer are
+# kept per thread (the --pipeline FX stage runs on a thread pool) and the
+# buffer only grows, so a worker rendering many files allocates it once.
+
+_post = threading.local()
+
+
+def find_last_audible(audio: np.ndarray, threshold: float = SILENCE_THRESHOLD) -> int:
+    """Index of the last frame with any sample beyond ±threshold, or -1.
+
+    Scans SCAN_BLOCK frames at a time from the end, so trailing silence
+    costs two reductions per block and nothing is allocated until the
+    audible block is found.
+    """
+    for end in range(len(audio), 0, -SCAN_BLOCK):
+        chunk = audio[max(0, end - SCAN_BLOCK):end]
+        if chunk.max() > threshold or chunk.min() < -threshold:
+            loud = np.abs(chunk) > threshold
+            if loud.ndim > 1:
+                loud = loud.any(axis=1)
+            return end - len(chunk) + int(np.flatnonzero(loud)[-1])
+    return -1
+
+
+def find_first_audible(audio: np.ndarray, threshold: float = SILENCE_THRESHOLD) -> int:
+    """Index of the first frame with any sample beyond ±threshold, or -1."""
+    for start in range(0, len(audio), SCAN_BLOCK):
+        chunk = audio[start:start + SCAN_BLOCK]
+        if chunk.max() > threshold or chunk.min() < -threshold:
+            loud = np.abs(chunk) > threshold
+            if loud.ndim > 1:
+                loud = loud.any(axis=1)
+            return start + int(np.flatnonzero(loud)[0])
+    return -1
+
+
+def trims_onsets(midi_path: str, category: str, trim_onsets: bool) -> bool:
+    """Whether --trim-onsets applies to this asset."""
+    return (trim_onsets and category in ONSET_TRIM_CATEGORIES
+            and not is_looping(asset_id(midi_path, category)))
+
+
+def onset_start(first: int, sr: int) -> int:
+    """Frame to start at so ONSET_PAD_SECONDS of lead-in stay before first."""
+    return max(0, first - int(ONSET_PAD_SECONDS * sr))
+
+
+def noise_tail_end(last: int, length: int, sr: int) -> int:
+    """Frames to keep when the FX output was last above the noise floor at last."""
+    if last < 0:
+        return length
+    return min(length, last + 1 + int(NOISE_TAIL_SECONDS * sr))
+
+
+def add_noise_inplace(audio: np.ndarray, intensity: float) -> np.ndarray:
+    """add_noise() without temporaries: float32 noise into a reused buffer."""
+    if not hasattr(_post, "rng"):
+        _post.rng = np.random.default_rng()
+        _post.noise = np.empty(0, dtype=np.float32)
+    if _post.noise.size < audio.size:
+        _post.noise = np.empty(audio.size, dtype=np.float32)
+    noise = _post.noise[:audio.size].reshape(audio.shape)
+    _post.rng.standard_normal(dtype=np.float32, out=noise)
+    noise *= intensity
+    audio += noise
+    return audio
+
+
+def peak_abs(audio: np.ndarray) -> float:
+    """max(|audio|) without materializing np.abs(audio)."""
+    if audio.size == 0:
+        return 0.0
+    return float(max(audio.max(), -audio.min()))
+
+
+def post_process(audio: np.ndarray, intensity: float, target: float = 0.9) -> np.ndarray:
+    """Steps 5-6 in place: add the noise floor, then normalize to target peak."""
+    add_noise_inplace(audio, intensity)
+    peak = peak_abs(audio)
+    if peak > 0:
+        audio *= target / peak
+    return audio
+
+
+def channel_mode(asset: str) -> str:
+    """CHANNEL_MODE for an asset: its own entry, else its category's."""
+    return CHANNEL_MODE.get(asset, CHANNEL_MODE.get(asset.split("/", 1)[0], "auto"))
+
+
+class ChannelStats:
+    """Running L/R energy sums of a stereo signal, fed block by block."""
+
+    def __init__(self, channels: int):
+        self.channels = channels
+        self.ll = self.rr = self.lr = 0.0
+
+    def update(self, block: np.ndarray):
+        if self.channels != 2:
+            return
+        left, right = block[:, 0], block[:, 1]
+        self.ll += float(np.dot(left, left))
+        self.rr += float(np.dot(right, right))
+        self.lr += float(np.dot(left, right))
+
+    def correlation(self) -> float:
+        if self.ll == 0.0 or self.rr == 0.0:
+            return 1.0 if self.ll == self.rr else 0.0
+        return float(self.lr / np.sqrt(self.ll * self.rr))
+
+    def side_db(self) -> float:
+        """Side energy relative to mid, floored at -120 dB."""
+        mid = self.ll + self.rr + 2 * self.lr
+        side = self.ll + self.rr - 2 * self.lr
+        if mid <= 0.0:
+            return 0.0 if side > 0.0 else -120.0
+        return max(-120.0, float(10 * np.log10(max(side, 0.0) / mid + 1e-12)))
+
+    def collapse(self, asset: str) -> bool:
+        """Whether to write this asset's signal mono (see CHANNEL_MODE)."""
+        mode = channel_mode(asset)
+        if self.channels != 2 or mode == "stereo":
+            return False
+        if mode == "mono":
+            return True
+        return bool(self.correlation() >= MONO_MIN_CORRELATION
+                    and self.side_db() <= MONO_MAX_SIDE_DB)
+
+    def describe(self, collapsed: bool) -> dict:
+        return {
+            "channels": 1 if collapsed else self.channels,
+            "collapsed": bool(collapsed),
+            "correlation": round(float(self.correlation()), 5),
+            "side_db": round(float(self.side_db()), 2),
+        }
+
+
+def downmix(block: np.ndarray) -> np.ndarray:
+    """(frames, 2) → (frames, 1) mid signal."""
+    mono = block[:, :1] + block[:, 1:2]
+    mono *= 0.5
+    return mono
+
+
+def fluidsynth_cmd(midi_path: str, wav_path: str) -> list:
+    return [
         FLUIDSYNTH,
         "-ni",                  # No interactive, no MIDI input
         "-F", wav_path,         # Output file
         "-r", str(SAMPLE_RATE), # Sample rate
-        "-g", "0.5",            # Gain (moderate)
-        SOUNDFONT,
+        "-g", str(SYNTH_GAIN),  # Gain (moderate)
+        active_soundfont(),
         midi_path,
     ]
+
+
+def render_midi_to_wav(midi_path: str, wav_path: str):
+    """Render a MIDI file to WAV using FluidSynth."""
+    cmd = fluidsynth_cmd(midi_path, wav_path)
     result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
     if not os.path.exists(wav_path):
         print(f"  ERROR: FluidSynth failed for {midi_path}")
@@ -205,79 +570,1695 @@ def render_midi_to_wav(midi_path: str, wav_path: str):
     return True
 
 
-def process_file(midi_path: str, category: str):
-    """Full pipeline: render MIDI → apply effects → save WAV."""
+# --- In-process FluidSynth backend ---
+# One synth per process: the soundfont is parsed once and reused for every
+# file the process renders. MIDI is played with sample-accurate timing and
+# rendered straight into a float32 array, with no temp WAV in between.
+
+_synth = None
+
+# The soundfont the synth loads: SOUNDFONT, or the subset cut from it when
+# that covers every file (see pick_soundfont). Set in the main process and
+# handed to pool workers through init_worker.
+_soundfont = None
+
+if fluidsynth is not None:
+    fluid_synth_write_float = fluidsynth.cfunc(
+        'fluid_synth_write_float', c_int,
+        ('synth', c_void_p, 1), ('len', c_int, 1),
+        ('lout', c_void_p, 1), ('loff', c_int, 1), ('lincr', c_int, 1),
+        ('rout', c_void_p, 1), ('roff', c_int, 1), ('rincr', c_int, 1),
+    )
+    fluid_player_add_mem = fluidsynth.cfunc(
+        'fluid_player_add_mem', c_int,
+        ('player', c_void_p, 1), ('buffer', c_void_p, 1), ('len', c_size_t, 1),
+    )
+
+
+def resolve_backend(backend: str) -> str:
+    """Map "auto" to "inproc" when pyfluidsynth is importable, else "subprocess"."""
+    if backend == "auto":
+        return "inproc" if fluidsynth is not None else "subprocess"
+    return backend
+
+
+def active_soundfont() -> str:
+    return _soundfont or SOUNDFONT
+
+
+def get_synth():
+    """Return this process's synth, loading the soundfont on first use."""
+    global _synth
+    if _synth is None:
+        synth = fluidsynth.Synth(gain=SYNTH_GAIN, samplerate=SAMPLE_RATE)
+        synth.setting("player.timing-source", "sample")  # Offline, not wall clock
+        if synth.sfload(active_soundfont()) == fluidsynth.FLUID_FAILED:
+            raise RuntimeError(f"FluidSynth could not load {active_soundfont()}")
+        _synth = synth
+    return _synth
+
+
+def render_midi_blocks(midi_path: str, data: bytes = None):
+    """Yield float32 (SYNTH_BLOCK, 2) blocks of a MIDI file rendered by the resident synth.
+
+    With data (SMF bytes), the MIDI is played from memory and midi_path only
+    names it. Raises RuntimeError if FluidSynth cannot load the file.
+    """
+    synth = get_synth()
+    synth.system_reset()  # Drop notes/programs left over from the previous file
+
+    player = fluidsynth.new_fluid_player(synth.synth)
+    try:
+        if data is not None:
+            # FluidSynth copies the buffer, so data may be freed after this call
+            status = fluid_player_add_mem(player, data, len(data))
+        else:
+            status = fluidsynth.fluid_player_add(player, midi_path.encode())
+        if status != fluidsynth.FLUID_OK:
+            raise RuntimeError(f"FluidSynth could not load {midi_path}")
+        fluidsynth.fluid_player_play(player)
+
+        while fluidsynth.fluid_player_get_status(player) == fluidsynth.FLUID_PLAYER_PLAYING:
+            block = np.empty((SYNTH_BLOCK, 2), dtype=np.float32)
+            ptr = block.ctypes.data
+            # Interleaved stereo: left at offset 0, right at 1, stride 2
+            fluid_synth_write_float(synth.synth, SYNTH_BLOCK, ptr, 0, 2, ptr, 1, 2)
+            yield block
+    finally:
+        fluidsynth.delete_fluid_player(player)
+
+
+def render_midi_to_array(midi_path: str, data: bytes = None):
+    """Render a MIDI file (or its bytes) to a float32 (frames, 2) array with the resident synth."""
+    try:
+        blocks = list(render_midi_blocks(midi_path, data))
+    except RuntimeError as e:
+        print(f"  ERROR: {e}")
+        return None
+    if not blocks:
+        print(f"  ERROR: FluidSynth rendered no audio for {midi_path}")
+        return None
+    return np.concatenate(blocks)
+
+
+def render_midi_to_wav_inproc(midi_path: str, wav_path: str):
+    """Stream the resident synth's output into a float WAV, block by block."""
+    try:
+        with sf.SoundFile(wav_path, "w", SAMPLE_RATE, 2, subtype="FLOAT") as out:
+            for block in render_midi_blocks(midi_path):
+                out.write(block)
+    except RuntimeError as e:
+        print(f"  ERROR: {e}")
+        return False
+    return True
+
+
+def init_worker(backend: str, warm_fx: bool = False, soundfont: str = None):
+    """Pool initializer: preload the soundfont before the first job arrives.
+
+    With warm_fx, also build every effect chain once and push a block of
+    silence through it, so the first real render pays no setup cost.
+    """
+    global _soundfont
+    _soundfont = soundfont
+    if backend == "inproc":
+        get_synth()
+    if warm_fx:
+        silence = np.zeros((SYNTH_BLOCK, 2), dtype=np.float32)
+        for factory in {*SPECIAL_FX.values(), *CATEGORY_FX.values()}:
+            factory()(silence, SAMPLE_RATE)
+
+
+# --- Instrumentation ---
+# Every stage of every file records wall time, CPU time (this process plus
+# child processes such as the fluidsynth CLI) and memory: the process's
+# peak RSS so far (ru_maxrss never goes down, so on a warm worker this is
+# the high-water mark of everything it ran before, not of the stage), and,
+# only under --profile, the peak traced allocation inside the stage.
+# tracemalloc hooks every allocation and slows numpy-heavy stages, so
+# --report alone leaves it off to keep the timings honest.
+
+def process_peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 1024  # bytes vs KiB
+
+
+def cpu_seconds() -> float:
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+class StageTimer:
+    """Per-stage wall/CPU/memory stats for one file."""
+
+    def __init__(self, snapshots: bool = False):
+        self.stages = {}
+        self.snapshots = snapshots  # Keep a tracemalloc snapshot at the fullest stage
+        self.snapshot = None
+        self._snapshot_bytes = -1
+
+    @contextmanager
+    def stage(self, name: str):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        wall, cpu = time.perf_counter(), cpu_seconds()
+        try:
+            yield
+        finally:
+            stats = {
+                "wall_s": time.perf_counter() - wall,
+                "cpu_s": cpu_seconds() - cpu,
+                "process_peak_rss_mb": process_peak_rss_mb(),
+            }
+            if tracing:
+                current, peak = tracemalloc.get_traced_memory()
+                stats["peak_traced_mb"] = peak / 2**20
+                if self.snapshots and current > self._snapshot_bytes:
+                    self.snapshot = tracemalloc.take_snapshot()
+                    self._snapshot_bytes = current
+            self.stages[name] = stats
+
+    def result(self, asset: str, fx_name: str, duration: float, sample_rate: int,
+               mix: dict, onset: float) -> dict:
+        return {
+            "asset": asset,
+            "fx": fx_name,
+            "duration_s": duration,
+            "sample_rate": sample_rate,
+            "mix": mix,
+            "onset_s": onset,
+            "wall_s": sum(s["wall_s"] for s in self.stages.values()),
+            "stages": self.stages,
+        }
+
+
+def process_file(midi_path: str, category: str, backend: str = "subprocess",
+                 stream: bool = False, formats=("wav",), timer=None, data: bytes = None,
+                 full_rate: bool = False, trim_onsets: bool = False, targets=()):
+    """Full pipeline: render MIDI → apply effects → save WAV (and/or encoded).
+
+    With data (SMF bytes, e.g. straight from generate_midi), midi_path only
+    names the asset: the MIDI is synthesized from memory by the inproc
+    backend, and only the final outputs touch the disk.
+
+    Returns a result dict (asset, fx, per-stage stats) or False on failure.
+    """
+    timer = timer or StageTimer()
+    if data is not None and (stream or backend != "inproc"):
+        print("  ERROR: in-memory MIDI needs the inproc backend and no --stream")
+        return False
+    if stream:
+        return process_file_streaming(midi_path, category, backend, formats, timer, full_rate,
+                                      trim_onsets, targets)
+
     filename = os.path.splitext(os.path.basename(midi_path))[0]
 
     # Create output directory
     out_dir = os.path.join(WAV_DIR, category)
     os.makedirs(out_dir, exist_ok=True)
 
-    clean_path = os.path.join(out_dir, f"{filename}_clean.wav")
-    final_path = os.path.join(out_dir, f"{filename}.wav")
+    if backend == "inproc":
+        # Steps 1-2: Render MIDI straight into memory
+        with timer.stage("synth"):
+            audio = render_midi_to_array(midi_path, data)
+        if audio is None:
+            return False
+        sr = SAMPLE_RATE
+    else:
+        clean_path = os.path.join(out_dir, f"{filename}_clean.wav")
 
-    # Step 1: Render MIDI → clean WAV
-    if not render_midi_to_wav(midi_path, clean_path):
-        return False
+        # Step 1: Render MIDI → clean WAV
+        with timer.stage("synth"):
+            ok = render_midi_to_wav(midi_path, clean_path)
+        if not ok:
+            return False
+
+        # Step 2: Load clean audio, then drop the intermediate file
+        with timer.stage("read"):
+            audio, sr = sf.read(clean_path, dtype='float32')
+            os.remove(clean_path)
+
+    return process_audio(audio, sr, midi_path, category, formats, timer, full_rate,
+                         trim_onsets, targets)
 
-    # Step 2: Load clean audio
-    audio, sr = sf.read(clean_path, dtype='float32')
+
+def process_audio(audio: np.ndarray, sr: int, midi_path: str, category: str,
+                  formats=("wav",), timer=None, full_rate: bool = False,
+                  trim_onsets: bool = False, targets=()):
+    """process_file() from the clean render on: trim → effects → post → write."""
+    timer = timer or StageTimer()
+    filename = os.path.splitext(os.path.basename(midi_path))[0]
+    trim_lead = trims_onsets(midi_path, category, trim_onsets)
 
     # Handle mono → ensure 2D array
     if audio.ndim == 1:
         audio = audio.reshape(-1, 1)
 
-    # Trim silence from end (keep leading silence for timing)
-    # Find last sample above threshold
-    threshold = 0.001
-    abs_audio = np.abs(audio).max(axis=1) if audio.ndim > 1 else np.abs(audio)
-    nonsilent = np.where(abs_audio > threshold)[0]
-    if len(nonsilent) > 0:
-        # Keep 0.5s tail after last audible sample
-        tail_samples = int(0.5 * sr)
-        end_idx = min(len(audio), nonsilent[-1] + tail_samples)
-        audio = audio[:end_idx]
+    # Trim silence from end (keep leading silence for timing, unless
+    # --trim-onsets cuts it down to a pad)
+    onset = 0
+    with timer.stage("trim"):
+        last = find_last_audible(audio)
+        if last >= 0:
+            # Keep 0.5s tail after last audible sample
+            end_idx = min(len(audio), last + int(TAIL_SECONDS * sr))
+            audio = audio[:end_idx]
+        if trim_lead:
+            onset = onset_start(find_first_audible(audio), sr)
+            audio = audio[onset:]
 
     # Step 3: Pick effect chain
-    if filename in SPECIAL_FX:
-        board = SPECIAL_FX[filename]()
-        fx_name = filename
-    else:
-        board = CATEGORY_FX.get(category, fx_ui)()
-        fx_name = category
+    factory, fx_name = resolve_fx(filename, category)
+    board = factory()
+    rate = output_rate(factory, full_rate)
 
     # Step 4: Apply effects
-    processed = board(audio, sr)
-
-    # Step 5: Add noise floor (analog grit)
-    noise_intensity = {
-        "music": 0.0015,
-        "stingers": 0.001,
-        "player": 0.002,
-        "skeleton": 0.0015,
-        "environment": 0.0025,
-        "ui": 0.0008,
-    }.get(category, 0.001)
-
-    processed = add_noise(processed, noise_intensity)
-
-    # Step 6: Normalize to prevent clipping
-    peak = np.max(np.abs(processed))
-    if peak > 0:
-        processed = processed * (0.9 / peak)
+    with timer.stage("fx"):
+        processed = board(audio, sr)
+        if trim_lead:  # Drop the reverb tail once it is under the noise floor
+            last = find_last_audible(processed, NOISE_INTENSITY.get(category, 0.001))
+            processed = processed[:noise_tail_end(last, len(processed), sr)]
+
+    # Step 4b: Collapse to mono when both channels carry the same signal
+    with timer.stage("mix"):
+        stats = ChannelStats(processed.shape[1])
+        stats.update(processed)
+        collapsed = stats.collapse(asset_id(midi_path, category))
+        if collapsed:
+            processed = downmix(processed)
+
+    # Step 5-6: Add noise floor (analog grit), normalize to prevent clipping
+    with timer.stage("post"):
+        post_process(processed, NOISE_INTENSITY.get(category, 0.001))
+
+    # Step 7: Save / encode every requested format and target
+    with timer.stage("write"):
+        writers = open_writers(category, filename, formats, sr, processed.shape[1], rate,
+                               targets)
+        if len(writers) > 1:
+            with ThreadPoolExecutor(max_workers=len(writers)) as pool:
+                list(pool.map(write_and_close, writers, [processed] * len(writers)))
+        else:
+            for writer in writers:
+                write_and_close(writer, processed)
+
+    print(f"  {describe_outputs(writers)} [fx: {fx_name}{describe_rate(rate)}"
+          f"{', mono' if collapsed else ''}{describe_onset(onset, sr)}]")
+    return timer.result(asset_id(midi_path, category), fx_name, len(processed) / sr, rate,
+                        stats.describe(collapsed), round(onset / sr, 6))
+
+
+# --- Output Encoders ---
+
+def output_file(category: str, filename: str, fmt: str) -> str:
+    """Path of one encoded output: wav/<category>/<name>.wav, ogg/<category>/<name>.ogg, …"""
+    out_root = WAV_DIR if fmt == "wav" else os.path.join(BASE, fmt)
+    return os.path.join(out_root, category, filename + OUTPUT_FORMATS[fmt]["ext"])
+
+
+def encode_settings(fmt: str, category: str) -> dict:
+    """Everything besides the audio that shapes an encoded file."""
+    settings = dict(OUTPUT_FORMATS[fmt])
+    if fmt in ENCODE_BITRATE:
+        settings["kbps"] = ENCODE_BITRATE[fmt].get(category, 96)
+    return settings
+
+
+def opus_compression_level(kbps: int, channels: int) -> float:
+    """libsndfile takes a 0-1 compression level for Opus, not a bitrate.
+
+    It maps level L to (6 + 250 * (1 - L)) kbps per channel; invert that.
+    """
+    per_channel = kbps / channels
+    return min(1.0, max(0.0, 1.0 - (per_channel - 6) / 250))
+
+
+class EncodedWriter:
+    """Incremental writer for one output format.
+
+    Takes (frames, channels) float32 blocks at the render rate, so the
+    in-memory path writes once and the streaming path writes per block.
+    Output is resampled to rate (default: sr) unless the format fixes one,
+    and downmixed first when mono is set. calibrate() sets the gain that
+    renormalizes resampled output.
+    """
+
+    def __init__(self, fmt: str, path: str, sr: int, channels: int, category: str,
+                 rate: int = None, mono: bool = False, label: str = None):
+        settings = encode_settings(fmt, category)
+        out_sr = settings.get("sample_rate", rate or sr)
+        self.path = path
+        self.label = label or os.path.basename(path)
+        self.downmix = mono and channels == 2
+        if self.downmix:
+            channels = 1
+        self.channels_first = False
+        self.gain = 1.0
+        self.rates = (sr, out_sr, channels)
+        self.resampler = StreamResampler(sr, out_sr, channels) if out_sr != sr else None
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if fmt == "wav":
+            self.file = sf.SoundFile(path, "w", out_sr, channels, subtype="PCM_16")
+        elif fmt == "flac":
+            self.file = sf.SoundFile(path, "w", out_sr, channels, format="FLAC",
+                                     subtype="PCM_16", compression_level=1.0)
+        elif fmt == "opus":
+            self.file = sf.SoundFile(
+                path, "w", out_sr, channels, format="OGG", subtype="OPUS",
+                compression_level=opus_compression_level(settings["kbps"], channels),
+            )
+        elif fmt == "ogg":
+            # Pedalboard's Vorbis encoder takes a real bitrate target
+            self.file = AudioFile(path, "w", out_sr, channels, quality=f"{settings['kbps']} kbps")
+            self.channels_first = True
+        else:
+            raise ValueError(f"Unknown output format: {fmt}")
+
+    def calibrate(self, blocks, target: float = 0.9) -> float:
+        """Set the gain so the resampled signal peaks at target. blocks is
+        the whole signal as written later; a no-op without resampling.
+        Returns the gain."""
+        if self.resampler is not None:
+            probe = StreamResampler(*self.rates)
+            peak = 0.0
+            for block in blocks:
+                if self.downmix:
+                    block = downmix(block)
+                peak = max(peak, peak_abs(probe.process(np.ascontiguousarray(block.T))))
+            peak = max(peak, peak_abs(probe.process(None)))
+            self.gain = target / peak if peak > 0 else 1.0
+        return self.gain
+
+    def write(self, block: np.ndarray):
+        if self.downmix:
+            block = downmix(block)
+        if self.resampler is not None:
+            block = self.resampler.process(np.ascontiguousarray(block.T)).T
+        self._write(block)
+
+    def _write(self, block: np.ndarray):
+        if len(block):
+            if self.gain != 1.0:
+                block = block * self.gain
+            self.file.write(block.T if self.channels_first else block)
+
+    def close(self):
+        if self.resampler is not None:
+            self._write(self.resampler.process(None).T)  # Flush resampler tail
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def target_file(target: str, category: str, filename: str) -> str:
+    """Path of one target output: targets/<target>/<category>/<name>.<ext>."""
+    ext = OUTPUT_FORMATS[RENDER_TARGETS[target]["format"]]["ext"]
+    return os.path.join(TARGET_DIR, target, category, filename + ext)
+
+
+def open_writers(category: str, filename: str, formats, sr: int, channels: int,
+                 rate: int = None, targets=()):
+    writers = [
+        EncodedWriter(fmt, output_file(category, filename, fmt), sr, channels, category,
+                      format_rate(fmt, rate))
+        for fmt in formats
+    ]
+    for target in targets:
+        spec = RENDER_TARGETS[target]
+        path = target_file(target, category, filename)
+        writers.append(EncodedWriter(
+            spec["format"], path, sr, channels, category,
+            spec["sample_rate"] or format_rate(spec["format"], rate),
+            mono=spec["channels"] == 1, label=f"{target}/{os.path.basename(path)}",
+        ))
+    return writers
+
+
+def write_and_close(writer: EncodedWriter, block: np.ndarray):
+    """Write a whole signal, renormalized after resampling."""
+    with writer:
+        writer.calibrate([block])
+        writer.write(block)
+
+
+def describe_rate(rate: int) -> str:
+    return f", {rate} Hz" if rate != SAMPLE_RATE else ""
+
+
+def describe_onset(onset: int, sr: int) -> str:
+    return f", onset -{onset / sr * 1000:.0f} ms" if onset else ""
+
+
+def describe_outputs(writers) -> str:
+    return ", ".join(
+        f"{w.label} ({os.path.getsize(w.path) / 1024:.0f} KB)"
+        for w in writers
+    )
+
+
+# --- SFX Sprites ---
+# Each category's one-shots are concatenated into a single sprite file with
+# SPRITE_GAP_SECONDS of silence between entries, plus a JSON index of
+# {event, variant, offset, duration} (seconds), so the client preloads a
+# category with one request and one decodeAudioData. Built from the WAV
+# masters of the job list after rendering, then encoded in every requested
+# format. Like a segment set, a sprite is rebuilt only when its source key
+# (member masters, onsets and events, formats and sprite settings) changes.
+
+def pack_sprites(category: str, jobs, formats, full_rate: bool = False):
+    """Pack one category's rendered one-shots. Returns the index path, or None."""
+    members = []
+    for midi_path, job_category in jobs:
+        asset = asset_id(midi_path, job_category)
+        wav_path = output_file(category, asset.split("/", 1)[1], "wav")
+        if job_category == category and not is_looping(asset) and os.path.exists(wav_path):
+            members.append((asset, wav_path))
+    if not members:
+        return None
+    members.sort()
+
+    onsets = load_onsets()
+    index_path = os.path.join(SPRITE_DIR, f"{category}.json")
+    rate = max(asset_rate(asset, full_rate) for asset, _ in members)
+    source = hashlib.sha256(json.dumps([
+        [[asset, hash_file(wav_path), onsets.get(asset, 0.0), asset_events(asset)]
+         for asset, wav_path in members],
+        SPRITE_GAP_SECONDS,
+        [[fmt, encode_settings(fmt, category), format_rate(fmt, rate)] for fmt in formats],
+    ], sort_keys=True).encode()).hexdigest()
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+        if index.get("source") == source and all(
+                os.path.exists(os.path.join(BASE, rel)) for rel in index["files"].values()):
+            return index_path
+    except (OSError, ValueError, KeyError):
+        pass
+
+    clips = []
+    for asset, wav_path in members:
+        audio, sr = sf.read(wav_path, dtype='float32', always_2d=True)
+        clips.append((asset, audio, sr))
+
+    sr = clips[0][2]
+    if any(clip_sr != sr for _, _, clip_sr in clips):
+        print(f"  ERROR: {category} one-shots have mixed sample rates, not packing")
+        return None
+    channels = max(audio.shape[1] for _, audio, _ in clips)
+    gap = int(SPRITE_GAP_SECONDS * sr)
+
+    total = sum(len(audio) + gap for _, audio, _ in clips)
+    sprite = np.zeros((total, channels), dtype=np.float32)
+    entries = []
+    pos = 0
+    for asset, audio, _ in clips:
+        sprite[pos:pos + len(audio)] = audio  # Mono broadcasts across channels
+        for event, variant in asset_events(asset) or [(None, 0)]:
+            entries.append({
+                "event": event,
+                "variant": variant,
+                "asset": asset,
+                "offset": round(pos / sr, 6),
+                "duration": round(len(audio) / sr, 6),
+                "onset_trimmed": onsets.get(asset, 0.0),
+            })
+        pos += len(audio) + gap
+
+    files = {}  # Lossy files at the highest output rate among the members
+    for fmt in formats:
+        path = os.path.join(SPRITE_DIR, category + OUTPUT_FORMATS[fmt]["ext"])
+        write_and_close(EncodedWriter(fmt, path, sr, channels, category, format_rate(fmt, rate)),
+                        sprite)
+        files[fmt] = os.path.relpath(path, BASE)
+
+    with open(index_path, "w") as f:
+        json.dump({
+            "category": category,
+            "source": source,
+            "sample_rate": sr,
+            "channels": channels,
+            "gap": SPRITE_GAP_SECONDS,
+            "files": files,
+            "sprites": entries,
+        }, f, indent=2)
+
+    sizes = ", ".join(
+        f"{os.path.basename(rel)} ({os.path.getsize(os.path.join(BASE, rel)) / 1024:.0f} KB)"
+        for rel in files.values()
+    )
+    print(f"  {category}: {len(clips)} one-shots, {total / sr:.1f}s → {sizes}")
+    return index_path
+
+
+# --- Music Segments ---
+# Long loops are fetched whole and fully decoded before their first note.
+# With --segments, each music WAV master is cut at bar lines (from the
+# MIDI tempo map, via the MIDI index) into chunks of at least
+# SEGMENT_MIN_SECONDS. Each chunk is encoded as its own file in every
+# requested format, so it decodes on its own. A playlist
+# SEGMENT_DIR/<category>/<name>.json lists each chunk's start, duration,
+# bars and files. The client can start playing after segment 0, schedule
+# each chunk at its start time and keep only a window of them decoded.
+# A set is rebuilt only when its source key changes (WAV master, bars,
+# formats and segment settings), and every chunk is published in the
+# manifest like any other output.
+
+SEGMENT_CATEGORIES = ["music"]
+SEGMENT_MIN_SECONDS = 4.0
+
+
+def segment_bounds(bars, frames: int, sr: int):
+    """[(start_frame, end_frame, first_bar)] covering all frames, cut on bar lines."""
+    min_frames = int(SEGMENT_MIN_SECONDS * sr)
+    cuts = [(0, 0)]
+    for bar, start in enumerate(bars):
+        frame = int(round(start * sr))
+        if frame - cuts[-1][0] >= min_frames and frames - frame >= min_frames // 2:
+            cuts.append((frame, bar))
+    ends = [frame for frame, _ in cuts[1:]] + [frames]
+    return [(start, end, bar) for (start, bar), end in zip(cuts, ends)]
 
-    # Step 7: Save
-    sf.write(final_path, processed, sr)
 
-    # Clean up intermediate file
-    os.remove(clean_path)
+def segment_asset(midi_path: str, category: str, bars, formats, full_rate: bool = False):
+    """Split one rendered asset into bar-aligned chunks. Returns the playlist path, or None."""
+    asset = asset_id(midi_path, category)
+    filename = asset.split("/", 1)[1]
+    wav_path = output_file(category, filename, "wav")
+    if not os.path.exists(wav_path):
+        print(f"  ERROR: {asset} has no WAV master to segment")
+        return None
+    playlist_path = os.path.join(SEGMENT_DIR, category, f"{filename}.json")
+    rate = asset_rate(asset, full_rate)
+    source = hashlib.sha256(json.dumps([
+        hash_file(wav_path), list(bars), SEGMENT_MIN_SECONDS,
+        [[fmt, encode_settings(fmt, category), format_rate(fmt, rate)] for fmt in formats],
+    ], sort_keys=True).encode()).hexdigest()
+    try:
+        with open(playlist_path) as f:
+            playlist = json.load(f)
+        if playlist.get("source") == source and all(
+                os.path.exists(os.path.join(BASE, rel))
+                for seg in playlist["segments"] for rel in seg["files"].values()):
+            return playlist_path
+    except (OSError, ValueError, KeyError):
+        pass
+
+    audio, sr = sf.read(wav_path, dtype='float32', always_2d=True)
+    out_dir = os.path.join(SEGMENT_DIR, category, filename)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    bounds = segment_bounds(bars, len(audio), sr)
+    gains = {}  # One gain per format over the whole track, so chunks match
+    segments = []
+    for i, (start, end, first_bar) in enumerate(bounds):
+        next_bar = bounds[i + 1][2] if i + 1 < len(bounds) else len(bars)
+        files = {}
+        for fmt in formats:
+            path = os.path.join(out_dir, f"{i:03d}{OUTPUT_FORMATS[fmt]['ext']}")
+            with EncodedWriter(fmt, path, sr, audio.shape[1], category,
+                               format_rate(fmt, rate)) as writer:
+                if fmt not in gains:
+                    gains[fmt] = writer.calibrate([audio])
+                writer.gain = gains[fmt]
+                writer.write(audio[start:end])
+            files[fmt] = os.path.relpath(path, BASE)
+        segments.append({
+            "index": i,
+            "start": round(start / sr, 6),
+            "duration": round((end - start) / sr, 6),
+            "bars": [first_bar, next_bar],
+            "files": files,
+        })
+
+    with open(playlist_path, "w") as f:
+        json.dump({
+            "asset": asset,
+            "source": source,
+            "loop": is_looping(asset),
+            "sample_rate": sr,
+            "channels": audio.shape[1],
+            "duration": round(len(audio) / sr, 6),
+            "segments": segments,
+        }, f, indent=2)
+    print(f"  {asset}: {len(segments)} segments over {len(bars)} bars, "
+          f"{len(audio) / sr:.1f}s")
+    return playlist_path
+
+
+# --- Sound Manifest ---
+# Every output (per-asset files in each format, sprites, music segments) is
+# published into DIST_DIR under a content-hashed name, hard-linked where
+# possible, and described in DIST_DIR/manifest.json. Hashed names can be served with
+# immutable cache headers; decoded_bytes (float32 PCM, what an AudioBuffer
+# holds once decodeAudioData resamples to CONTEXT_RATE) lets the client
+# budget memory before preloading. decoded_bytes_native is the same at the
+# file's own rate, for contexts created at it. Sprite indexes and segment
+# playlists are published the same way, with their file lists rewritten to
+# the hashed URLs, so sprite_index / playlist in an entry are fetchable.
+
+def publish_hashed(path: str):
+    """Link path into DIST_DIR as <name>.<hash>.<ext>. Returns (rel path, sha256)."""
+    digest = hash_file(path)
+    rel = os.path.relpath(path, BASE)
+    stem, ext = os.path.splitext(rel)
+    hashed = os.path.join(DIST_DIR, f"{stem}.{digest[:10]}{ext}")
+    if not os.path.exists(hashed):
+        os.makedirs(os.path.dirname(hashed), exist_ok=True)
+        try:
+            os.link(path, hashed)
+        except OSError:  # Cross-device or no hard links: fall back to a copy
+            shutil.copyfile(path, hashed)
+    return os.path.relpath(hashed, BASE), digest
+
+
+def publish_json(data: dict, path: str) -> str:
+    """publish_hashed() for a JSON file rewritten in memory (a sprite index
+    or playlist pointing at hashed URLs), named after path. Returns its URL."""
+    body = json.dumps(data, indent=2).encode()
+    digest = hashlib.sha256(body).hexdigest()
+    stem, ext = os.path.splitext(os.path.relpath(path, BASE))
+    hashed = os.path.join(DIST_DIR, f"{stem}.{digest[:10]}{ext}")
+    if not os.path.exists(hashed):
+        os.makedirs(os.path.dirname(hashed), exist_ok=True)
+        with open(hashed, "wb") as f:
+            f.write(body)
+    return MANIFEST_URL_BASE + os.path.relpath(hashed, BASE).replace(os.sep, "/")
+
+
+def manifest_entry(path: str, asset: str, fmt: str, events) -> dict:
+    info = sf.info(path)
+    rel, digest = publish_hashed(path)
+    return {
+        "asset": asset,
+        "events": events,
+        "format": fmt,
+        "path": MANIFEST_URL_BASE + rel.replace(os.sep, "/"),
+        "sha256": digest,
+        "duration": round(info.frames / info.samplerate, 6),
+        "channels": info.channels,
+        "sample_rate": info.samplerate,
+        "encoded_bytes": os.path.getsize(path),
+        "decoded_bytes": -(-info.frames * CONTEXT_RATE // info.samplerate) * info.channels * 4,
+        "decoded_bytes_native": info.frames * info.channels * 4,
+    }
+
+
+def write_manifest(jobs, formats):
+    """Describe every existing output in DIST_DIR/manifest.json. Returns its path."""
+    entries = []
+    onsets = load_onsets()
+    for midi_path, category in jobs:
+        asset = asset_id(midi_path, category)
+        filename = asset.split("/", 1)[1]
+        events = [event for event, _ in asset_events(asset)]
+        for fmt in formats:
+            path = output_file(category, filename, fmt)
+            if os.path.exists(path):
+                entry = manifest_entry(path, asset, fmt, events)
+                if asset in onsets:
+                    entry["onset_trimmed"] = onsets[asset]
+                entries.append(entry)
+
+    # Sprite indexes and playlists are published too, rewritten to point at
+    # the hashed URLs of the files listed next to them
+    indexes = []
+    for index_path in sorted(glob.glob(os.path.join(SPRITE_DIR, "*.json"))):
+        with open(index_path) as f:
+            index = json.load(f)
+        events = sorted({s["event"] for s in index["sprites"] if s["event"]})
+        published = []
+        for fmt, rel in index["files"].items():
+            path = os.path.join(BASE, rel)
+            if fmt in formats and os.path.exists(path):
+                published.append(manifest_entry(path, f"sprites/{index['category']}", fmt, events))
+        if published:
+            index["files"] = {e["format"]: e["path"] for e in published}
+            url = publish_json(index, index_path)
+            indexes.append(url)
+            for entry in published:
+                entry["sprite_index"] = url
+            entries += published
+
+    for playlist_path in sorted(glob.glob(os.path.join(SEGMENT_DIR, "*", "*.json"))):
+        with open(playlist_path) as f:
+            playlist = json.load(f)
+        events = [event for event, _ in asset_events(playlist["asset"])]
+        published = []
+        for segment in playlist["segments"]:
+            files = {}
+            for fmt, rel in segment["files"].items():
+                path = os.path.join(BASE, rel)
+                if fmt in formats and os.path.exists(path):
+                    entry = manifest_entry(path, f"segments/{playlist['asset']}", fmt, events)
+                    entry["segment"] = segment["index"]
+                    files[fmt] = entry["path"]
+                    published.append(entry)
+            segment["files"] = files
+        if published:
+            url = publish_json(playlist, playlist_path)
+            indexes.append(url)
+            for entry in published:
+                entry["playlist"] = url
+            entries += published
+
+    # Drop hashed files no entry points at any more
+    urls = [e["path"] for e in entries] + indexes
+    live = {os.path.join(BASE, url[len(MANIFEST_URL_BASE):]) for url in urls}
+    for root, _, names in os.walk(DIST_DIR):
+        for name in names:
+            path = os.path.join(root, name)
+            if path not in live and name != "manifest.json":
+                os.remove(path)
+
+    manifest_path = os.path.join(DIST_DIR, "manifest.json")
+    os.makedirs(DIST_DIR, exist_ok=True)
+    with open(manifest_path, "w") as f:
+        json.dump({
+            "base_url": MANIFEST_URL_BASE,
+            "entries": entries,
+        }, f, indent=2)
+    return manifest_path
+
+
+# --- Streaming (bounded-memory) pipeline ---
+# Same steps as process_file, but audio only ever lives in STREAM_BLOCK-sized
+# pieces: the clean WAV is read block by block, the chain runs with its
+# state carried across blocks (reset=False), and the FX output lands in a
+# memory-mapped float32 scratch file. The channel stats for the mono
+# decision are a pass over the kept part of that map, the downmix (if any)
+# and noise floor the next, normalization the last, writing the final
+# outputs incrementally. Peak RSS is flat in track length, which matters
+# for the multi-minute music loops.
+
+def find_last_audible_streaming(path: str, threshold: float = SILENCE_THRESHOLD) -> int:
+    """find_last_audible() over a WAV on disk, one STREAM_BLOCK at a time."""
+    last = -1
+    pos = 0
+    with sf.SoundFile(path) as src:
+        for block in src.blocks(blocksize=STREAM_BLOCK, dtype='float32', always_2d=True):
+            idx = find_last_audible(block, threshold)
+            if idx >= 0:
+                last = pos + idx
+            pos += len(block)
+    return last
+
+
+def find_first_audible_streaming(path: str, threshold: float = SILENCE_THRESHOLD) -> int:
+    """find_first_audible() over a WAV on disk, stopping at the first loud block."""
+    pos = 0
+    with sf.SoundFile(path) as src:
+        for block in src.blocks(blocksize=STREAM_BLOCK, dtype='float32', always_2d=True):
+            idx = find_first_audible(block, threshold)
+            if idx >= 0:
+                return pos + idx
+            pos += len(block)
+    return -1
+
+
+def process_file_streaming(midi_path: str, category: str, backend: str = "subprocess",
+                           formats=("wav",), timer=None, full_rate: bool = False,
+                           trim_onsets: bool = False, targets=()):
+    """process_file() in bounded memory, for long tracks."""
+    timer = timer or StageTimer()
+    filename = os.path.splitext(os.path.basename(midi_path))[0]
+    trim_lead = trims_onsets(midi_path, category, trim_onsets)
+
+    out_dir = os.path.join(WAV_DIR, category)
+    os.makedirs(out_dir, exist_ok=True)
+
+    clean_path = os.path.join(out_dir, f"{filename}_clean.wav")
+    scratch_path = os.path.join(out_dir, f"{filename}_fx.f32")
+
+    # Step 1: Render MIDI → clean WAV
+    render = render_midi_to_wav_inproc if backend == "inproc" else render_midi_to_wav
+    with timer.stage("synth"):
+        ok = render(midi_path, clean_path)
+    if not ok:
+        return False
+
+    try:
+        info = sf.info(clean_path)
+        sr, channels = info.samplerate, info.channels
+
+        # Step 2: Trim silence from end (first pass, keep leading silence
+        # unless --trim-onsets cuts it down to a pad)
+        end_idx = info.frames
+        onset = 0
+        with timer.stage("trim"):
+            last = find_last_audible_streaming(clean_path)
+            if trim_lead:
+                onset = onset_start(find_first_audible_streaming(clean_path), sr)
+        if last >= 0:
+            end_idx = min(info.frames, last + int(TAIL_SECONDS * sr))
+        onset = min(onset, end_idx)
+        if end_idx == onset:
+            print(f"  ERROR: {filename} rendered empty audio")
+            return False
+
+        # Step 3: Pick effect chain
+        factory, fx_name = resolve_fx(filename, category)
+        board = factory()
+        rate = output_rate(factory, full_rate)
+        noise_intensity = NOISE_INTENSITY.get(category, 0.001)
+
+        # Step 4: FX, block by block into the scratch map, gathering the
+        # noise-floor tail scan on the way
+        with timer.stage("fx"):
+            fx_out = np.memmap(scratch_path, dtype=np.float32, mode="w+",
+                               shape=(end_idx - onset, channels))
+            pos = 0
+            loud = -1
+            with sf.SoundFile(clean_path) as src:
+                src.seek(onset)
+                for block in src.blocks(blocksize=STREAM_BLOCK, dtype='float32',
+                                        always_2d=True, frames=end_idx - onset):
+                    processed = board.process(block, sr, reset=False)
+                    if trim_lead:
+                        idx = find_last_audible(processed, noise_intensity)
+                        if idx >= 0:
+                            loud = pos + idx
+                    fx_out[pos:pos + len(processed)] = processed
+                    pos += len(processed)
+
+        if trim_lead:
+            pos = noise_tail_end(loud, pos, sr)
+
+        # Step 4b: Decide mono collapse from the stats of the frames that
+        # are kept, as process_audio does; a collapsed file lives on in
+        # the map's first column
+        with timer.stage("mix"):
+            stats = ChannelStats(channels)
+            for start in range(0, pos, STREAM_BLOCK):
+                stats.update(fx_out[start:min(pos, start + STREAM_BLOCK)])
+            collapsed = stats.collapse(asset_id(midi_path, category))
+        out = fx_out[:, :1] if collapsed else fx_out
+
+        # Step 5: Downmix + noise floor (second pass, after the mix decision
+        # as in process_audio), tracking the peak for normalization
+        with timer.stage("post"):
+            peak = 0.0
+            for start in range(0, pos, STREAM_BLOCK):
+                end = min(pos, start + STREAM_BLOCK)
+                block = downmix(fx_out[start:end]) if collapsed else out[start:end]
+                add_noise_inplace(block, noise_intensity)
+                if collapsed:
+                    out[start:end] = block
+                peak = max(peak, peak_abs(block))
+
+        # Steps 6-7: Normalize (third pass over the map, plus a probe pass
+        # per resampled output) and save / encode
+        with timer.stage("write"):
+            scale = 0.9 / peak if peak > 0 else 1.0
+            writers = open_writers(category, filename, formats, sr,
+                                   1 if collapsed else channels, rate, targets)
+            pool = ThreadPoolExecutor(max_workers=len(writers))
+            try:
+                list(pool.map(lambda w: w.calibrate(
+                    out[start:min(pos, start + STREAM_BLOCK)] * scale
+                    for start in range(0, pos, STREAM_BLOCK)), writers))
+                for start in range(0, pos, STREAM_BLOCK):
+                    block = out[start:min(pos, start + STREAM_BLOCK)] * scale
+                    list(pool.map(lambda w: w.write(block), writers))
+            finally:
+                pool.shutdown()
+                for writer in writers:
+                    writer.close()
+        del fx_out, out
+    finally:
+        for tmp_path in (clean_path, scratch_path):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    print(f"  {describe_outputs(writers)} [fx: {fx_name}{describe_rate(rate)}"
+          f"{', mono' if collapsed else ''}{describe_onset(onset, sr)}, streamed]")
+    return timer.result(asset_id(midi_path, category), fx_name, pos / sr, rate,
+                        stats.describe(collapsed), round(onset / sr, 6))
+
+
+# --- Incremental Render Cache ---
+# An output is reused when every input that shapes it hashes the same as
+# the last successful render: MIDI bytes, soundfont, sample rate and
+# output rate, the resolved effect chain (plugins + parameters), the noise
+# intensity, the mono-collapse and onset-trim settings and the encoder
+# settings of every requested output format and render target.
+
+def hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def describe_fx(factory) -> str:
+    """Stable text form of an effect chain: plugin types and parameters."""
+    board = factory()
+    # Plugin reprs end in " at 0x…" which changes every run
+    plugins = [re.sub(r" at 0x[0-9a-fA-F]+", "", repr(p)) for p in board]
+    return f"{factory.__name__}:" + ";".join(plugins)
+
+
+def render_key(midi_path: str, category: str, soundfont_hash: str, options: dict,
+               data: bytes = None) -> str:
+    """Cache key of one asset. With data, the MIDI bytes are hashed in place
+    of the file, so in-memory and on-disk renders of the same MIDI agree."""
+    filename = os.path.splitext(os.path.basename(midi_path))[0]
+    factory, _ = resolve_fx(filename, category)
+    midi_hash = hashlib.sha256(data).hexdigest() if data is not None else hash_file(midi_path)
+    h = hashlib.sha256()
+    h.update(midi_hash.encode())
+    h.update(soundfont_hash.encode())
+    h.update(str(SAMPLE_RATE).encode())
+    h.update(str(output_rate(factory, options["full_rate"])).encode())
+    h.update(options["backend"].encode())
+    h.update(describe_fx(factory).encode())
+    h.update(repr(NOISE_INTENSITY.get(category, 0.001)).encode())
+    h.update(repr((channel_mode(asset_id(midi_path, category)),
+                   MONO_MIN_CORRELATION, MONO_MAX_SIDE_DB)).encode())
+    if trims_onsets(midi_path, category, options["trim_onsets"]):
+        h.update(repr(("onsets", ONSET_PAD_SECONDS, NOISE_TAIL_SECONDS)).encode())
+    for fmt in options["formats"]:
+        h.update(json.dumps([fmt, encode_settings(fmt, category)], sort_keys=True).encode())
+    for target in options["targets"]:
+        spec = RENDER_TARGETS[target]
+        h.update(json.dumps([target, spec, encode_settings(spec["format"], category)],
+                            sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def asset_id(midi_path: str, category: str) -> str:
+    """Cache/report name of an asset: <category>/<midi name>."""
+    return f"{category}/{os.path.splitext(os.path.basename(midi_path))[0]}"
+
+
+def outputs_exist(midi_path: str, category: str, formats, targets=()) -> bool:
+    filename = os.path.splitext(os.path.basename(midi_path))[0]
+    paths = [output_file(category, filename, fmt) for fmt in formats]
+    paths += [target_file(target, category, filename) for target in targets]
+    return all(os.path.exists(path) for path in paths)
+
+
+def load_cache() -> dict:
+    try:
+        with open(CACHE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache: dict, path: str = CACHE_FILE):
+    os.makedirs(WAV_DIR, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def load_onsets() -> dict:
+    """{asset: seconds of lead-in cut by --trim-onsets} for the current outputs."""
+    try:
+        with open(ONSET_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# --- MIDI Analysis Index ---
+# Duration, event count, channels, programs and sounding notes of every
+# MIDI file, cached by content hash. Render cost tracks duration, so pool
+# renders submit the longest jobs first: a multi-minute music loop picked
+# up last would otherwise leave every other worker idle while it finishes.
+# The notes decide whether the soundfont subset covers a file.
+
+def bar_starts(mid: mido.MidiFile) -> list:
+    """Start time (s) of every bar, from the tempo map and time signatures.
+
+    A time signature change that does not land on a bar line starts a new
+    bar where it lands.
+    """
+    tpb = mid.ticks_per_beat
+    tempo = 500000  # 120 BPM until the first set_tempo
+    bar_ticks = 4 * tpb
+    bars = []  # (tick, seconds)
+    tick, seconds = 0, 0.0
+    bar_tick = next_bar = 0
+    for msg in mido.merge_tracks(mid.tracks):
+        target = tick + msg.time
+        while next_bar <= target:
+            bars.append((next_bar, seconds + mido.tick2second(next_bar - tick, tpb, tempo)))
+            bar_tick, next_bar = next_bar, next_bar + bar_ticks
+        seconds += mido.tick2second(msg.time, tpb, tempo)
+        tick = target
+        if msg.type == "set_tempo":
+            tempo = msg.tempo
+        elif msg.type == "time_signature":
+            bar_ticks = msg.numerator * tpb * 4 // msg.denominator
+            if tick != bar_tick:
+                bars.append((tick, seconds))
+                bar_tick = tick
+            next_bar = bar_tick + bar_ticks
+    # A bar line at (or past) the last event starts nothing
+    return [round(start, 4) for bar, start in bars if bar < tick]
+
+
+def analyze_midi(midi_path: str, data: bytes = None) -> dict:
+    """Parse one MIDI file (or its bytes) into an index entry."""
+    mid = mido.MidiFile(file=io.BytesIO(data)) if data is not None else mido.MidiFile(midi_path)
+    channels = set()
+    programs = set()
+    notes = set()  # (bank, program, key) of every note that sounds
+    current = {}  # channel -> program
+    banks = {}  # channel -> bank select (CC 0)
+    for msg in mido.merge_tracks(mid.tracks):
+        if msg.is_meta or not hasattr(msg, "channel"):
+            continue
+        ch = msg.channel
+        channels.add(ch)
+        if msg.type == "program_change":
+            programs.add((ch, msg.program))
+            current[ch] = msg.program
+        elif msg.type == "control_change" and msg.control == 0:
+            banks[ch] = msg.value
+        elif msg.type == "note_on" and msg.velocity > 0:
+            bank = 128 if ch == 9 else banks.get(ch, 0)  # Channel 10 plays the drum bank
+            notes.add((bank, current.get(ch, 0), msg.note))
+    return {
+        "duration": round(mid.length, 3),
+        "events": sum(len(track) for track in mid.tracks),
+        "channels": sorted(channels),
+        "programs": [list(p) for p in sorted(programs)],
+        "notes": [list(n) for n in sorted(notes)],
+        "bars": bar_starts(mid),
+    }
+
+
+def midi_index(jobs, data: dict = None) -> dict:
+    """Index entries for jobs, as {midi_path: entry}.
+
+    Entries are reused from INDEX_FILE when the file's hash matches; with
+    data ({midi_path: bytes}) the bytes are analyzed instead of the files.
+    """
+    try:
+        with open(INDEX_FILE) as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        stored = {}
+    cached = stored.get("files", {}) if stored.get("version") == INDEX_VERSION else {}
+
+    index = {}
+    by_hash = {}
+    added = False
+    for midi_path, _ in jobs:
+        midi = data.get(midi_path) if data else None
+        digest = hashlib.sha256(midi).hexdigest() if midi is not None else hash_file(midi_path)
+        if digest not in cached:
+            try:
+                cached[digest] = analyze_midi(midi_path, midi)
+                added = True
+            except (OSError, ValueError, EOFError) as e:
+                print(f"  ERROR: could not analyze {os.path.basename(midi_path)}: {e}")
+                continue
+        index[midi_path] = by_hash[digest] = cached[digest]
+
+    if added or len(by_hash) != len(cached):  # New entries, or stale ones to drop
+        os.makedirs(WAV_DIR, exist_ok=True)
+        with open(INDEX_FILE, "w") as f:
+            json.dump({"version": INDEX_VERSION, "files": by_hash}, f, indent=2, sort_keys=True)
+    return index
+
+
+def subset_path() -> str:
+    """Where subset_soundfont.py writes the subset of SOUNDFONT (+ .json sidecar)."""
+    return os.path.splitext(SOUNDFONT)[0] + ".subset.sf2"
+
+
+def pick_soundfont(jobs, index: dict, soundfont_hash: str) -> str:
+    """The subset soundfont if it was cut from the current SOUNDFONT and has
+    every note the jobs play, else SOUNDFONT.
+
+    The subset keeps those presets' zones and samples unchanged, so renders
+    are identical either way and cache keys stay on the full soundfont.
+    """
+    path = subset_path()
+    try:
+        with open(path + ".json") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return SOUNDFONT
+    covered = {tuple(n) for n in meta.get("notes", [])}
+    fits = (
+        meta.get("source_sha256") == soundfont_hash
+        and os.path.exists(path)
+        and all(midi_path in index for midi_path, _ in jobs)
+        and all(tuple(n) in covered for midi_path, _ in jobs for n in index[midi_path]["notes"])
+    )
+    if not fits:
+        print(f"Soundfont subset does not cover the current MIDI files (re-run "
+              f"subset_soundfont.py); using {os.path.basename(SOUNDFONT)}")
+        return SOUNDFONT
+    return path
+
+
+def longest_first(jobs, index: dict):
+    """Jobs ordered by MIDI duration, longest first (unknown durations last)."""
+    return sorted(jobs, key=lambda job: index.get(job[0], {}).get("duration", 0.0), reverse=True)
+
+
+# --- Render Reports ---
+
+def render_job(midi_path: str, category: str, report: bool = False,
+               profile: bool = False, **options):
+    """process_file() with the requested instrumentation switched on."""
+    if profile and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    timer = StageTimer(snapshots=profile)
+    profiler = cProfile.Profile() if profile else None
+    if profiler:
+        profiler.enable()
+    try:
+        result = process_file(midi_path, category, timer=timer, **options)
+    finally:
+        if profiler:
+            profiler.disable()
+
+    if result and profile:
+        base = os.path.join(REPORT_DIR, "profiles", result["asset"].replace("/", "__"))
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        profiler.dump_stats(base + ".prof")
+        if timer.snapshot is not None:
+            with open(base + ".tracemalloc.txt", "w") as f:
+                for stat in timer.snapshot.statistics("lineno")[:25]:
+                    f.write(f"{stat}\n")
+    return result
+
+
+def keep_slowest_profiles(results, n: int):
+    """Delete profile dumps for everything but the n slowest files."""
+    ranked = sorted((r for r in results if r), key=lambda r: r["wall_s"], reverse=True)
+    keep = {r["asset"].replace("/", "__") for r in ranked[:n]}
+    for path in glob.glob(os.path.join(REPORT_DIR, "profiles", "*")):
+        if os.path.basename(path).split(".", 1)[0] not in keep:
+            os.remove(path)
+    return ranked[:n]
+
+
+def write_report(results):
+    """Write per-file/per-stage stats and per-category rollups (JSON + CSV)."""
+    files = [r for r in results if r]
+    categories = {}
+    for r in files:
+        category = r["asset"].split("/", 1)[0]
+        roll = categories.setdefault(category, {
+            "files": 0, "mono": 0, "audio_s": 0.0, "wall_s": 0.0, "cpu_s": 0.0, "stages": {},
+        })
+        roll["files"] += 1
+        roll["mono"] += r["mix"]["collapsed"]
+        roll["audio_s"] += r["duration_s"]
+        for name, st in r["stages"].items():
+            roll["wall_s"] += st["wall_s"]
+            roll["cpu_s"] += st["cpu_s"]
+            agg = roll["stages"].setdefault(
+                name, {"wall_s": 0.0, "cpu_s": 0.0, "process_peak_rss_mb": 0.0})
+            agg["wall_s"] += st["wall_s"]
+            agg["cpu_s"] += st["cpu_s"]
+            agg["process_peak_rss_mb"] = max(agg["process_peak_rss_mb"], st["process_peak_rss_mb"])
+            if "peak_traced_mb" in st:
+                agg["peak_traced_mb"] = max(agg.get("peak_traced_mb", 0.0), st["peak_traced_mb"])
 
-    size_kb = os.path.getsize(final_path) / 1024
-    print(f"  {filename}.wav ({size_kb:.0f} KB) [fx: {fx_name}]")
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    json_path = os.path.join(REPORT_DIR, "render_report.json")
+    with open(json_path, "w") as f:
+        json.dump({"files": files, "categories": categories}, f, indent=2)
+
+    csv_path = os.path.join(REPORT_DIR, "render_report.csv")
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["asset", "category", "stage", "wall_s", "cpu_s",
+                         "peak_traced_mb", "process_peak_rss_mb"])
+        for r in files:
+            for name, st in r["stages"].items():
+                writer.writerow([
+                    r["asset"], r["asset"].split("/", 1)[0], name,
+                    f"{st['wall_s']:.4f}", f"{st['cpu_s']:.4f}",
+                    f"{st['peak_traced_mb']:.2f}" if "peak_traced_mb" in st else "",
+                    f"{st['process_peak_rss_mb']:.1f}",
+                ])
+
+    print(f"\n--- REPORT ({json_path}, {csv_path}) ---")
+    for category, roll in categories.items():
+        slowest = max(roll["stages"].items(), key=lambda kv: kv[1]["wall_s"])[0]
+        print(f"  {category:<12} {roll['files']:>3} files  {roll['wall_s']:7.2f}s wall"
+              f"  {roll['cpu_s']:7.2f}s cpu  {roll['mono']:>3} mono  (most time in: {slowest})")
+
+
+def collect_jobs():
+    """Gather (midi_path, category) pairs for every MIDI file, grouped by category."""
+    jobs = []
+    for category in CATEGORIES:
+        cat_dir = os.path.join(MIDI_DIR, category)
+        if not os.path.isdir(cat_dir):
+            continue
+        midi_files = sorted(glob.glob(os.path.join(cat_dir, "*.mid")))
+        jobs.extend((midi_path, category) for midi_path in midi_files)
+    return jobs
+
+
+def run_serial(jobs, options: dict):
+    """Render jobs one at a time in this process. Returns {midi_path: result}."""
+    results = {}
+    current = None
+    for midi_path, category in jobs:
+        if category != current:
+            current = category
+            count = sum(1 for _, c in jobs if c == category)
+            print(f"\n--- {category.upper()} ({count} files) ---")
+        results[midi_path] = render_job(midi_path, category, **options)
+    return results
+
+
+def run_parallel(jobs, workers: int, options: dict):
+    """Render jobs on a process pool. Returns {midi_path: result}."""
+    print(f"\n--- RENDERING {len(jobs)} files on {workers} workers ---")
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(options["backend"], False, _soundfont)) as pool:
+        return run_on_pool(pool, jobs, options)
+
+
+def run_on_pool(pool, jobs, options: dict, data: dict = None):
+    """Submit jobs to an existing pool and wait for all of them.
+
+    With data ({midi_path: SMF bytes}), each job renders from its bytes.
+    """
+    results = {}
+    futures = {
+        pool.submit(render_job, midi_path, category,
+                    **({"data": data[midi_path]} if data else {}), **options): midi_path
+        for midi_path, category in jobs
+    }
+    for future in as_completed(futures):
+        midi_path = futures[future]
+        try:
+            results[midi_path] = future.result()
+        except Exception as e:
+            print(f"  ERROR: {os.path.basename(midi_path)} crashed in worker: {e}")
+            results[midi_path] = False
+    return results
+
+
+def plan_jobs(all_jobs, cache: dict, soundfont_hash: str, options: dict, key_fn=None):
+    """Split out the jobs whose cache key changed or whose outputs are missing.
+
+    Returns (jobs, {midi_path: key}) covering all_jobs.
+    """
+    key_fn = key_fn or render_key
+    keys = {}
+    jobs = []
+    for midi_path, category in all_jobs:
+        keys[midi_path] = key = key_fn(midi_path, category, soundfont_hash, options)
+        if (cache.get(asset_id(midi_path, category)) == key
+                and outputs_exist(midi_path, category, options["formats"], options["targets"])):
+            continue
+        jobs.append((midi_path, category))
+    return jobs, keys
+
+
+def record_results(jobs, results, keys, cache: dict):
+    """Store keys and trimmed onsets of successful renders and persist both."""
+    onsets = load_onsets()
+    for midi_path, category in jobs:
+        result = results.get(midi_path)
+        if result:
+            asset = asset_id(midi_path, category)
+            cache[asset] = keys[midi_path]
+            onsets.pop(asset, None)
+            if result["onset_s"]:
+                onsets[asset] = result["onset_s"]
+    save_cache(cache)
+    save_cache(onsets, ONSET_FILE)
+
+
+def finish_outputs(args, all_jobs, formats, index: dict = None):
+    """Post-render stages that look at the whole output tree."""
+    if args.sprites:
+        print("\n--- SPRITES ---")
+        for category in CATEGORIES:
+            pack_sprites(category, all_jobs, formats, args.full_rate)
+
+    if args.segments:
+        print("\n--- SEGMENTS ---")
+        for midi_path, category in all_jobs:
+            if category in SEGMENT_CATEGORIES and midi_path in (index or {}):
+                segment_asset(midi_path, category, index[midi_path]["bars"], formats,
+                              args.full_rate)
+
+    if args.manifest:
+        manifest_path = write_manifest(all_jobs, formats)
+        print(f"\nManifest: {manifest_path}")
+
+    if args.targets:
+        print("\n--- TARGETS ---")
+        for target in args.targets:
+            write_target_report(target, all_jobs)
+
+
+def write_target_report(target: str, jobs) -> str:
+    """Write TARGET_DIR/<target>/sizes.json for one target's outputs. Returns its path."""
+    spec = RENDER_TARGETS[target]
+    files = {}
+    for midi_path, category in jobs:
+        asset = asset_id(midi_path, category)
+        path = target_file(target, category, asset.split("/", 1)[1])
+        if not os.path.exists(path):
+            continue
+        info = sf.info(path)
+        files[asset] = {
+            "path": os.path.relpath(path, os.path.join(TARGET_DIR, target)),
+            "encoded_bytes": os.path.getsize(path),
+            "duration": round(info.frames / info.samplerate, 6),
+            "sample_rate": info.samplerate,
+            "channels": info.channels,
+        }
+    total = sum(f["encoded_bytes"] for f in files.values())
+
+    report_path = os.path.join(TARGET_DIR, target, "sizes.json")
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump({"target": target, "spec": spec, "total_bytes": total, "files": files},
+                  f, indent=2)
+    print(f"  {target:<8} {len(files):>3} files  {total / 1024:8.0f} KB  ({spec['format']})")
+    return report_path
+
+
+def parse_targets(value: str):
+    """--targets value → list of RENDER_TARGETS names, or None if one is unknown."""
+    names = [t.strip() for t in value.split(",") if t.strip()]
+    if names == ["all"]:
+        return list(RENDER_TARGETS)
+    unknown = [t for t in names if t not in RENDER_TARGETS]
+    if unknown:
+        print(f"ERROR: Unknown render target(s): {', '.join(unknown)}")
+        print(f"Choose from: {', '.join(RENDER_TARGETS)} (or all)")
+        return None
+    return names
+
+
+# --- Overlapped Pipeline (--pipeline) ---
+# Synthesis and effects run at the same time instead of back to back:
+# asyncio keeps up to N fluidsynth subprocesses going, each clean WAV they
+# finish goes into a bounded queue, and N threads drain the queue through
+# read → trim → effects → post → write. Pedalboard releases the GIL while
+# it processes, so the threads really run in parallel. When the queue is
+# full, a finished synth slot waits before starting its next file, so
+# clean WAVs never pile up on disk.
+
+PIPELINE_QUEUE = 4  # Clean renders allowed to wait for an FX thread
+
+
+class PipelineStats:
+    """Queue depth over time and busy time per stage, for the run summary."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.busy = {"synth": 0.0, "fx": 0.0}
+        self.depth_max = 0
+        self.depth_area = 0.0  # Integral of queue depth over time
+        self._depth = 0
+        self._since = self.start
+
+    def queue_changed(self, depth: int):
+        now = time.perf_counter()
+        self.depth_area += self._depth * (now - self._since)
+        self._depth, self._since = depth, now
+        self.depth_max = max(self.depth_max, depth)
+
+    def report(self, slots: int, results):
+        wall = time.perf_counter() - self.start
+        self.queue_changed(self._depth)
+        done = [r for r in results if r]
+        audio_s = sum(r["duration_s"] for r in done)
+        print(f"\n--- PIPELINE ({slots} synth processes + {slots} FX threads, {wall:.2f}s) ---")
+        for stage, busy in self.busy.items():
+            print(f"  {stage:<5} occupancy: {busy / (wall * slots):6.1%}")
+        print(f"  queue depth: mean {self.depth_area / wall:.2f}, max {self.depth_max} "
+              f"(bound {PIPELINE_QUEUE})")
+        print(f"  throughput: {len(done) / wall:.2f} files/s, "
+              f"{audio_s / wall:.1f}s of audio per second")
+
+
+async def synthesize(midi_path: str, wav_path: str) -> bool:
+    """render_midi_to_wav() as an asyncio subprocess."""
+    proc = await asyncio.create_subprocess_exec(
+        *fluidsynth_cmd(midi_path, wav_path),
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, stderr = await asyncio.wait_for(proc.communicate(), timeout=60)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        stderr = b"timed out after 60s"
+    if not os.path.exists(wav_path):
+        print(f"  ERROR: FluidSynth failed for {midi_path}")
+        print(f"  stderr: {stderr.decode(errors='replace')[:200]}")
+        return False
     return True
 
 
+def finish_clean(clean_path: str, midi_path: str, category: str, formats, timer,
+                 full_rate: bool = False, trim_onsets: bool = False, targets=()):
+    """Steps 2-7 of process_file() for a clean WAV from the synth stage."""
+    try:
+        with timer.stage("read"):
+            audio, sr = sf.read(clean_path, dtype='float32')
+    finally:
+        os.remove(clean_path)
+    return process_audio(audio, sr, midi_path, category, formats, timer, full_rate,
+                         trim_onsets, targets)
+
+
+async def run_pipeline(jobs, slots: int, formats, full_rate: bool = False,
+                       trim_onsets: bool = False, targets=()):
+    """Render jobs with synthesis and FX overlapped. Returns {midi_path: result}."""
+    print(f"\n--- PIPELINE: {len(jobs)} files, {slots} synth processes + {slots} FX threads ---")
+    stats = PipelineStats()
+    queue = asyncio.Queue(maxsize=PIPELINE_QUEUE)
+    synth_slots = asyncio.Semaphore(slots)
+    loop = asyncio.get_running_loop()
+    results = {}
+
+    async def produce(midi_path: str, category: str):
+        async with synth_slots:  # Held until queued: a full queue stalls synthesis
+            filename = os.path.splitext(os.path.basename(midi_path))[0]
+            clean_path = os.path.join(WAV_DIR, category, f"{filename}_clean.wav")
+            os.makedirs(os.path.dirname(clean_path), exist_ok=True)
+            timer = StageTimer()
+            start = time.perf_counter()
+            with timer.stage("synth"):
+                ok = await synthesize(midi_path, clean_path)
+            stats.busy["synth"] += time.perf_counter() - start
+            if not ok:
+                results[midi_path] = False
+                return
+            await queue.put((midi_path, category, clean_path, timer))
+            stats.queue_changed(queue.qsize())
+
+    async def consume(pool):
+        while True:
+            item = await queue.get()
+            stats.queue_changed(queue.qsize())
+            if item is None:
+                return
+            midi_path, category, clean_path, timer = item
+            start = time.perf_counter()
+            try:
+                results[midi_path] = await loop.run_in_executor(
+                    pool, finish_clean, clean_path, midi_path, category, formats, timer,
+                    full_rate, trim_onsets, targets)
+            except Exception as e:
+                print(f"  ERROR: {os.path.basename(midi_path)} failed in the FX stage: {e}")
+                results[midi_path] = False
+            stats.busy["fx"] += time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=slots) as pool:
+        consumers = [asyncio.create_task(consume(pool)) for _ in range(slots)]
+        await asyncio.gather(*(produce(midi_path, category) for midi_path, category in jobs))
+        for _ in consumers:
+            await queue.put(None)
+        await asyncio.gather(*consumers)
+
+    stats.report(slots, results.values())
+    return results
+
+
+# --- Watch Mode ---
+# Polls audio/midi/** and this file (the fx_* definitions) and re-renders
+# only what changed, on a pool of warm workers: soundfont loaded, chains
+# built. A MIDI save changes that file's cache key; an effect edit reloads
+# this file as a throwaway module to recompute every key (so only assets
+# whose chain or noise level changed re-render) and restarts the workers,
+# which are spawned rather than forked so they import the edited code.
+
+WATCH_INTERVAL = 0.2  # Seconds between polls
+FX_SOURCE = os.path.abspath(__file__)
+
+
+def watched_mtimes() -> dict:
+    paths = glob.glob(os.path.join(MIDI_DIR, "**", "*.mid"), recursive=True)
+    mtimes = {}
+    for path in paths + [FX_SOURCE]:
+        try:
+            mtimes[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            pass
+    return mtimes
+
+
+def load_live_module():
+    """Fresh copy of this file, to see edited effect chains without restarting."""
+    spec = importlib.util.spec_from_file_location("render_wav_live", FX_SOURCE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def start_warm_pool(workers: int, backend: str):
+    pool = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker, initargs=(backend, True, _soundfont),
+    )
+    # Workers start on demand; submit one no-op each so all of them spin up now
+    list(pool.map(time.sleep, [0] * workers))
+    return pool
+
+
+def watch(args, options: dict, workers: int, soundfont_hash: str, cache: dict):
+    global _soundfont
+    print(f"\n--- WATCHING {MIDI_DIR} + {os.path.basename(FX_SOURCE)} "
+          f"({workers} warm workers, Ctrl+C to stop) ---")
+    pool = start_warm_pool(workers, options["backend"])
+    key_fn = render_key
+    mtimes = watched_mtimes()
+    try:
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            current = watched_mtimes()
+            if current == mtimes:
+                continue
+            changed = {p for p in current.keys() | mtimes.keys() if current.get(p) != mtimes.get(p)}
+            mtimes = current
+
+            restart = False
+            if FX_SOURCE in changed:
+                try:
+                    key_fn = load_live_module().render_key
+                except Exception as e:
+                    print(f"  ERROR: {os.path.basename(FX_SOURCE)} failed to load: {e}")
+                    continue
+                restart = True
+
+            all_jobs = collect_jobs()
+            index = midi_index(all_jobs)
+            soundfont = pick_soundfont(all_jobs, index, soundfont_hash)
+            if soundfont != active_soundfont():  # A new preset/key outgrew the subset
+                _soundfont = soundfont
+                restart = True
+            if restart:
+                pool.shutdown(wait=True)
+                pool = start_warm_pool(workers, options["backend"])
+
+            jobs, keys = plan_jobs(all_jobs, cache, soundfont_hash, options, key_fn)
+            if not jobs:
+                continue
+            jobs = longest_first(jobs, index)
+
+            start = time.perf_counter()
+            print(f"\n[{time.strftime('%H:%M:%S')}] {len(changed)} change(s), "
+                  f"re-rendering {len(jobs)} file(s)")
+            results = run_on_pool(pool, jobs, options)
+            record_results(jobs, results, keys, cache)
+            finish_outputs(args, all_jobs, options["formats"], index)
+            ok = sum(1 for r in results.values() if r)
+            print(f"  Rebuilt {ok}/{len(jobs)} in {time.perf_counter() - start:.2f}s")
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Render MIDI files to grungy WAVs.")
+    parser.add_argument(
+        "--backend", choices=["auto", "inproc", "subprocess"], default="auto",
+        help="synthesis backend: in-process pyfluidsynth or fluidsynth CLI (default: auto)",
+    )
+    parser.add_argument(
+        "-f", "--force", action="store_true",
+        help="ignore the render cache and re-render every file",
+    )
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="process audio in fixed-size blocks so memory stays flat for long tracks",
+    )
+    parser.add_argument(
+        "--formats", default="wav",
+        help=f"comma-separated output formats from {', '.join(OUTPUT_FORMATS)} (default: wav)",
+    )
+    parser.add_argument(
+        "--full-rate", action="store_true",
+        help=f"write every output at {SAMPLE_RATE} Hz instead of each chain's lowpass-derived rate",
+    )
+    parser.add_argument(
+        "--targets", default="",
+        help=f"comma-separated render targets from {', '.join(RENDER_TARGETS)} (or all), "
+             "fanned out from the same synth + FX pass",
+    )
+    parser.add_argument(
+        "--trim-onsets", action="store_true",
+        help="cut SFX/UI lead-in silence to a pad and record the offset; also trims FX tails",
+    )
+    parser.add_argument(
+        "--sprites", action="store_true",
+        help="pack each category's one-shots into a sprite file + JSON index",
+    )
+    parser.add_argument(
+        "--segments", action="store_true",
+        help="split music into bar-aligned chunks + a playlist per track, for streamed playback",
+    )
+    parser.add_argument(
+        "--manifest", action="store_true",
+        help="publish content-hashed outputs to audio/dist with a manifest.json",
+    )
+    parser.add_argument(
+        "--report", action="store_true",
+        help="record per-stage wall/CPU/memory stats to audio/reports (JSON + CSV)",
+    )
+    parser.add_argument(
+        "--profile", type=int, default=0, metavar="N",
+        help="dump cProfile + tracemalloc snapshots for the N slowest files",
+    )
+    parser.add_argument(
+        "--pipeline", action="store_true",
+        help="overlap fluidsynth subprocesses (asyncio) with FX threads; -j sets both",
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="after building, keep warm workers and re-render on MIDI/effect edits",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1,
+        help="number of worker processes (0 = one per CPU core, default: 1)",
+    )
+    return parser.parse_args()
+
+
 def main():
+    global _soundfont
+    args = parse_args()
     print("=== DungeonSlopper MIDI → Grungy WAV Renderer ===\n")
 
     if not os.path.exists(SOUNDFONT):
@@ -285,28 +2266,89 @@ def main():
         print("Run the download script first or place a .sf2 file there.")
         return
 
-    categories = ["music", "stingers", "player", "skeleton", "environment", "ui"]
-    total = 0
-    success = 0
+    backend = resolve_backend(args.backend)
+    if args.pipeline:
+        if args.backend == "inproc" or args.stream or args.profile:
+            print("ERROR: --pipeline runs the fluidsynth CLI on whole files;")
+            print("it cannot be combined with --backend inproc, --stream or --profile.")
+            return
+        backend = "subprocess"
+    if backend == "inproc" and fluidsynth is None:
+        print("ERROR: --backend inproc needs pyfluidsynth and libfluidsynth")
+        print("Install them (pip install pyfluidsynth) or use --backend subprocess.")
+        return
+    print(f"Synthesis backend: {backend}")
 
-    for category in categories:
-        cat_dir = os.path.join(MIDI_DIR, category)
-        if not os.path.isdir(cat_dir):
-            continue
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in OUTPUT_FORMATS]
+    if unknown or not formats:
+        print(f"ERROR: Unknown output format(s): {', '.join(unknown) or '(none)'}")
+        print(f"Choose from: {', '.join(OUTPUT_FORMATS)}")
+        return
+    if (args.sprites or args.segments) and "wav" not in formats:
+        print("ERROR: --sprites/--segments cut the WAV masters; include wav in --formats")
+        return
+    args.targets = parse_targets(args.targets)
+    if args.targets is None:
+        return
 
-        midi_files = sorted(glob.glob(os.path.join(cat_dir, "*.mid")))
-        if not midi_files:
-            continue
+    options = {
+        "backend": backend, "stream": args.stream, "formats": formats,
+        "report": args.report, "profile": args.profile > 0,
+        "full_rate": args.full_rate, "trim_onsets": args.trim_onsets,
+        "targets": args.targets,
+    }
+    all_jobs = collect_jobs()
+
+    # Skip files whose inputs are unchanged since their last render
+    cache = {} if args.force else load_cache()
+    soundfont_hash = hash_file(SOUNDFONT)
+    index = midi_index(all_jobs)
+    _soundfont = pick_soundfont(all_jobs, index, soundfont_hash)
+    print(f"Soundfont: {os.path.relpath(_soundfont, BASE)}")
+    jobs, keys = plan_jobs(all_jobs, cache, soundfont_hash, options)
+
+    cached = len(all_jobs) - len(jobs)
+    if cached:
+        print(f"Cache: {cached} up-to-date, {len(jobs)} to render")
+
+    max_workers = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    workers = min(max_workers, max(1, len(jobs)))
 
-        print(f"\n--- {category.upper()} ({len(midi_files)} files) ---")
+    if args.pipeline:
+        jobs = longest_first(jobs, index)
+        results = asyncio.run(run_pipeline(jobs, workers, formats, args.full_rate,
+                                           args.trim_onsets, args.targets)) if jobs else {}
+    elif workers > 1:
+        jobs = longest_first(jobs, index)
+        results = run_parallel(jobs, workers, options)
+    else:
+        results = run_serial(jobs, options)
+
+    record_results(jobs, results, keys, cache)
+
+    if args.report:
+        write_report(results.values())
+    if args.profile > 0:
+        print(f"\n--- PROFILED (slowest {args.profile}, {os.path.join(REPORT_DIR, 'profiles')}) ---")
+        for r in keep_slowest_profiles(results.values(), args.profile):
+            print(f"  {r['asset']}: {r['wall_s']:.2f}s")
 
-        for midi_path in midi_files:
-            total += 1
-            if process_file(midi_path, category):
-                success += 1
+    finish_outputs(args, all_jobs, formats, index)
+
+    total = len(all_jobs)
+    success = cached + sum(1 for ok in results.values() if ok)
+    failed = [p for p, ok in results.items() if not ok]
+    if failed:
+        print(f"\n--- FAILED ({len(failed)}) ---")
+        for midi_path in sorted(failed):
+            print(f"  {os.path.relpath(midi_path, MIDI_DIR)}")
 
     print(f"\n=== Done! {success}/{total} files rendered to {WAV_DIR} ===")
 
+    if args.watch:
+        watch(args, options, max_workers, soundfont_hash, cache)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Soundfont subsetter: keep only what the MIDI corpus actually plays
+
+Scans every file under audio/midi/** (through render_wav's MIDI index) for
+the notes that sound, as (bank, program, key): program_change is followed
+per channel, and channel 10 plays the percussion bank (128). Then writes
+soundfonts/GeneralUser_GS.subset.sf2 with:
+  - only those presets
+  - in each, only the preset and instrument zones whose key range holds a
+    played key (global zones always stay)
+  - only the samples those zones use, plus their stereo partners
+
+Zones, generators, modulators and sample data are copied unchanged, so
+FluidSynth renders the corpus identically from the subset. A JSON sidecar
+records the source soundfont's hash and the covered notes: render_wav.py
+loads the subset only while it matches the soundfont and covers every
+MIDI file, and falls back to the full soundfont otherwise.
+
+Usage:
+  python subset_soundfont.py
+"""
+
+import os
+import json
+import struct
+
+from render_wav import SOUNDFONT, collect_jobs, hash_file, midi_index, subset_path
+
+# SoundFont 2.01 pdta records
+PHDR = struct.Struct("<20sHHHIII")  # name, preset, bank, bag index, library, genre, morphology
+INST = struct.Struct("<20sH")  # name, bag index
+BAG = struct.Struct("<HH")  # generator index, modulator index
+MOD = struct.Struct("<HHhHH")  # source, destination, amount, amount source, transform
+GEN = struct.Struct("<HH")  # operator, amount
+SHDR = struct.Struct("<20sIIIIIBbHH")  # name, start, end, loop start, loop end, rate, pitch, correction, link, type
+
+GEN_INSTRUMENT = 41
+GEN_KEY_RANGE = 43
+GEN_SAMPLE_ID = 53
+STEREO_LINKS = 0x2 | 0x4 | 0x8  # right / left / linked sample types
+SAMPLE_PAD = 46  # Zero sample points required after every sample
+
+
+def riff_chunks(data: bytes, start: int, end: int):
+    """Yield (id, body start, body size) of the chunks in data[start:end]."""
+    pos = start
+    while pos + 8 <= end:
+        cid = data[pos:pos + 4]
+        size = struct.unpack_from("<I", data, pos + 4)[0]
+        yield cid, pos + 8, size
+        pos += 8 + size + (size & 1)
+
+
+def read_soundfont(path: str) -> dict:
+    """Split an SF2 into its INFO list, sample data and pdta tables."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != b"RIFF" or data[8:12] != b"sfbk":
+        raise ValueError(f"{path} is not a SoundFont 2 file")
+
+    sf2 = {"info": b"", "smpl": b"", "sm24": None}
+    for cid, start, size in riff_chunks(data, 12, len(data)):
+        if cid != b"LIST":
+            continue
+        kind = data[start:start + 4]
+        if kind == b"INFO":
+            sf2["info"] = data[start + 4:start + size]
+            continue
+        for sub, sub_start, sub_size in riff_chunks(data, start + 4, start + size):
+            body = data[sub_start:sub_start + sub_size]
+            if kind == b"sdta" and sub in (b"smpl", b"sm24"):
+                sf2[sub.decode()] = body
+            elif kind == b"pdta":
+                sf2[sub.decode()] = body
+
+    for name, record in (("phdr", PHDR), ("pbag", BAG), ("pmod", MOD), ("pgen", GEN),
+                         ("inst", INST), ("ibag", BAG), ("imod", MOD), ("igen", GEN),
+                         ("shdr", SHDR)):
+        body = sf2.get(name, b"")
+        sf2[name] = [record.unpack_from(body, i * record.size)
+                     for i in range(len(body) // record.size)]
+    return sf2
+
+
+def zones(headers, bag_field: int, bags, gens, mods, i):
+    """(generators, modulators) of every zone of preset/instrument i."""
+    return [
+        (gens[bags[b][0]:bags[b + 1][0]], mods[bags[b][1]:bags[b + 1][1]])
+        for b in range(headers[i][bag_field], headers[i + 1][bag_field])
+    ]
+
+
+def record_name(header) -> str:
+    return header[0].split(b"\0")[0].decode("latin1")
+
+
+def key_range(zone_gens) -> range:
+    for op, amount in zone_gens:
+        if op == GEN_KEY_RANGE:
+            return range(amount & 0xFF, (amount >> 8) + 1)
+    return range(128)
+
+
+def target(zone_gens, op: int):
+    """The zone's instrument/sample index, or None for a global zone."""
+    for gen_op, amount in zone_gens:
+        if gen_op == op:
+            return amount
+    return None
+
+
+def kept_zones(zone_list, keys: set, op: int):
+    """Zones that can sound for keys: the leading global zone, and every
+    zone whose key range holds one of the keys."""
+    kept = []
+    for n, (zone_gens, zone_mods) in enumerate(zone_list):
+        if target(zone_gens, op) is None:
+            if n == 0:
+                kept.append((zone_gens, zone_mods, set()))
+            continue
+        reach = keys.intersection(key_range(zone_gens))
+        if reach:
+            kept.append((zone_gens, zone_mods, reach))
+    return kept
+
+
+def subset(sf2: dict, notes) -> dict:
+    """New pdta tables and sample data holding only what notes need."""
+    wanted = {}
+    for bank, program, key in notes:
+        wanted.setdefault((bank, program), set()).add(key)
+
+    presets = []  # (header, kept zones)
+    inst_keys = {}
+    for i, header in enumerate(sf2["phdr"][:-1]):
+        keys = wanted.get((header[2], header[1]))
+        if not keys:
+            continue
+        kept = kept_zones(zones(sf2["phdr"], 3, sf2["pbag"], sf2["pgen"], sf2["pmod"], i),
+                          keys, GEN_INSTRUMENT)
+        presets.append((header, kept))
+        for zone_gens, _, reach in kept:
+            inst = target(zone_gens, GEN_INSTRUMENT)
+            if inst is not None:
+                inst_keys.setdefault(inst, set()).update(reach)
+
+    instruments = {}
+    samples = set()
+    for inst in sorted(inst_keys):
+        kept = kept_zones(zones(sf2["inst"], 1, sf2["ibag"], sf2["igen"], sf2["imod"], inst),
+                          inst_keys[inst], GEN_SAMPLE_ID)
+        instruments[inst] = kept
+        samples.update(target(g, GEN_SAMPLE_ID) for g, _, _ in kept if target(g, GEN_SAMPLE_ID) is not None)
+
+    # Stereo pairs play together: keep each kept sample's partner too
+    pending = list(samples)
+    while pending:
+        header = sf2["shdr"][pending.pop()]
+        if header[9] & STEREO_LINKS and header[8] not in samples:
+            samples.add(header[8])
+            pending.append(header[8])
+
+    # Copy sample data, each sample followed by its zero pad
+    smpl = bytearray()
+    sm24 = bytearray() if sf2["sm24"] is not None else None
+    sample_map = {}
+    shdr = []
+    for old in sorted(samples):
+        name, start, end, loop_start, loop_end, rate, pitch, correction, link, kind = sf2["shdr"][old]
+        new_start = len(smpl) // 2
+        smpl += sf2["smpl"][start * 2:end * 2] + bytes(SAMPLE_PAD * 2)
+        if sm24 is not None:
+            sm24 += sf2["sm24"][start:end] + bytes(SAMPLE_PAD)
+        shift = new_start - start
+        sample_map[old] = len(shdr)
+        shdr.append([name, new_start, end + shift, loop_start + shift, loop_end + shift,
+                     rate, pitch, correction, link, kind])
+    for header in shdr:
+        if header[9] & STEREO_LINKS:
+            header[8] = sample_map.get(header[8], 0)
+    shdr.append((b"EOS", 0, 0, 0, 0, 0, 0, 0, 0, 0))
+
+    def pack_zones(kept, op, remap, bags, gens, mods):
+        for zone_gens, zone_mods, _ in kept:
+            bags.append((len(gens), len(mods)))
+            gens.extend((g_op, remap[amount] if g_op == op else amount) for g_op, amount in zone_gens)
+            mods.extend(zone_mods)
+
+    inst_map = {old: new for new, old in enumerate(instruments)}
+    inst, ibag, igen, imod = [], [], [], []
+    for old, kept in instruments.items():
+        inst.append((sf2["inst"][old][0], len(ibag)))
+        pack_zones(kept, GEN_SAMPLE_ID, sample_map, ibag, igen, imod)
+    inst.append((b"EOI", len(ibag)))
+
+    phdr, pbag, pgen, pmod = [], [], [], []
+    for header, kept in presets:
+        phdr.append(header[:3] + (len(pbag),) + header[4:])
+        pack_zones(kept, GEN_INSTRUMENT, inst_map, pbag, pgen, pmod)
+    phdr.append((b"EOP", 0, 0, len(pbag), 0, 0, 0))
+
+    for bags, gens, mods in ((pbag, pgen, pmod), (ibag, igen, imod)):
+        bags.append((len(gens), len(mods)))  # Terminal records
+        gens.append((0, 0))
+        mods.append((0, 0, 0, 0, 0))
+
+    return {
+        "info": sf2["info"], "smpl": bytes(smpl), "sm24": sm24 and bytes(sm24),
+        "phdr": phdr, "pbag": pbag, "pmod": pmod, "pgen": pgen,
+        "inst": inst, "ibag": ibag, "imod": imod, "igen": igen, "shdr": shdr,
+    }
+
+
+def chunk(cid: bytes, body: bytes) -> bytes:
+    return cid + struct.pack("<I", len(body)) + body + (b"\0" if len(body) & 1 else b"")
+
+
+def write_soundfont(path: str, sf2: dict):
+    sdta = chunk(b"smpl", sf2["smpl"])
+    if sf2["sm24"] is not None:
+        sdta += chunk(b"sm24", sf2["sm24"])
+    pdta = b"".join(
+        chunk(name.encode(), b"".join(record.pack(*row) for row in sf2[name]))
+        for name, record in (("phdr", PHDR), ("pbag", BAG), ("pmod", MOD), ("pgen", GEN),
+                             ("inst", INST), ("ibag", BAG), ("imod", MOD), ("igen", GEN),
+                             ("shdr", SHDR))
+    )
+    body = (b"sfbk" + chunk(b"LIST", b"INFO" + sf2["info"])
+            + chunk(b"LIST", b"sdta" + sdta) + chunk(b"LIST", b"pdta" + pdta))
+    with open(path, "wb") as f:
+        f.write(chunk(b"RIFF", body))
+
+
+def main():
+    print("=== DungeonSlopper Soundfont Subsetter ===\n")
+    if not os.path.exists(SOUNDFONT):
+        print(f"ERROR: Soundfont not found at {SOUNDFONT}")
+        return
+
+    jobs = collect_jobs()
+    index = midi_index(jobs)
+    notes = sorted({tuple(n) for entry in index.values() for n in entry["notes"]})
+    if not notes:
+        print("ERROR: No notes found under audio/midi; generate the MIDI files first")
+        return
+
+    sf2 = read_soundfont(SOUNDFONT)
+    small = subset(sf2, notes)
+    # FluidSynth falls back to another preset for these, so the subset
+    # does not claim them and render_wav.py keeps the full soundfont
+    kept = {(h[2], h[1]) for h in small["phdr"][:-1]}
+    for bank, program in sorted({(b, p) for b, p, _ in notes} - kept):
+        print(f"  WARNING: bank {bank} program {program} is not in {os.path.basename(SOUNDFONT)}")
+
+    path = subset_path()
+    write_soundfont(path, small)
+    with open(path + ".json", "w") as f:
+        json.dump({
+            "source_sha256": hash_file(SOUNDFONT),
+            "presets": [[h[2], h[1], record_name(h)] for h in small["phdr"][:-1]],
+            "notes": [list(n) for n in notes if n[:2] in kept],
+        }, f, indent=2)
+
+    for header in small["phdr"][:-1]:
+        print(f"  bank {header[2]:>3} program {header[1]:>3}  {record_name(header)}")
+    full, cut = os.path.getsize(SOUNDFONT), os.path.getsize(path)
+    print(f"\n  presets: {len(sf2['phdr']) - 1} → {len(small['phdr']) - 1}, "
+          f"samples: {len(sf2['shdr']) - 1} → {len(small['shdr']) - 1}")
+    print(f"\n=== Done! {full / 2**20:.1f} MB → {cut / 2**20:.1f} MB: {path} ===")
+
+
+if __name__ == "__main__":
+    main()